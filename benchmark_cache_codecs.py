@@ -0,0 +1,55 @@
+"""
+Cache Codec Benchmark
+Encodes the products of a generated 20-listing search page with every cache
+codec and compression, and reports the size stored in Redis and the encode and
+decode time, next to the plain JSON text the cache used to store.
+
+Usage: python benchmark_cache_codecs.py [rounds]
+"""
+
+import json
+import logging
+import sys
+import time
+
+from benchmark_parsing import synthetic_search_page
+from cache_codecs import CODECS, COMPRESSIONS, CacheCodec, zstd_available
+from product_parsing import extract_products
+
+logging.disable(logging.WARNING)
+
+def time_call(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1_000_000
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    records = extract_products(synthetic_search_page(), 'personalized necklace')
+
+    legacy = json.dumps(records, default=str)
+    baseline = len(legacy.encode('utf-8'))
+    print(f"\n📦 {len(records)} cached products, {rounds} rounds")
+    print(f"{'format':<14} {'bytes':>7} {'ratio':>6} {'encode µs':>10} {'decode µs':>10}  round trip")
+    encode_us = time_call(lambda: json.dumps(records, default=str), rounds)
+    decode_us = time_call(lambda: json.loads(legacy), rounds)
+    print(f"{'legacy json':<14} {baseline:>7} {1:>5.2f}x {encode_us:>10.1f} {decode_us:>10.1f}  ✅")
+
+    for codec_name in CODECS:
+        for compression in COMPRESSIONS:
+            if compression == 'zstd' and not zstd_available():
+                continue
+            codec = CacheCodec(codec_name, compression)
+            encoded = codec.encode(records)
+            same = '✅' if CacheCodec.decode(encoded) == json.loads(legacy) else '❌ differs'
+            encode_us = time_call(lambda: codec.encode(records), rounds)
+            decode_us = time_call(lambda: CacheCodec.decode(encoded), rounds)
+            name = f"{codec_name}+{compression}"
+            print(f"{name:<14} {len(encoded):>7} {baseline / len(encoded):>5.2f}x {encode_us:>10.1f} {decode_us:>10.1f}  {same}")
+
+    if not zstd_available():
+        print("\nzstd skipped: pip install zstandard to include it")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+"""
+Parser Benchmark
+Times product and trending extraction with every parser backend and checks that
+all backends extract the same data. Runs on a saved Etsy page and on a generated
+search results page with 20 listing cards (the saved homepage has none).
+
+Usage: python benchmark_parsing.py [page.html] [rounds]
+"""
+
+import asyncio
+import json
+import logging
+import random
+import sys
+import time
+
+from html_parsing import PARSER_BACKENDS, parse_html
+from trending_keywords import TRENDING_PLAN, TrendingKeywordsManager
+from product_parsing import CONTAINER_PLAN, PRODUCT_FIELD_ACCEPT, extract_products, results_region
+from main_py import EtsyScraper, bot_manager
+
+# Keep the per-call extraction logs out of the timing table
+logging.disable(logging.WARNING)
+
+CARD_TEMPLATE = """
+<li><div data-test-id="organic-search-result" class="wt-list-unstyled">
+  <a data-test-id="listing-link" href="/listing/{id}/handmade-item-{i}" class="listing-link wt-display-block">
+    <div class="v2-listing-card__img wt-position-relative"><img class="v2-listing-card__img wt-image" src="https://i.etsystatic.com/{id}/il_340x270.jpg" alt=""></div>
+    <div class="v2-listing-card__info">
+      <h3 class="v2-listing-card__title wt-text-caption wt-text-truncate">Personalized Vintage Necklace Boho Gift {i}</h3>
+      <div class="wt-display-flex-xs wt-align-items-center">
+        <p class="wt-text-caption wt-text-gray wt-mr-xs-1">Shop{i}Studio</p>
+        <span class="wt-text-caption wt-text-gray">({reviews} reviews)</span>
+      </div>
+      <div class="n-listing-card__price wt-text-title-01"><span class="currency-symbol">$</span><span class="currency-value">{price}</span></div>
+      <span class="wt-badge wt-badge--small">Star Seller</span>
+    </div>
+  </a>
+</div></li>"""
+
+def synthetic_search_page(cards: int = 20, structured_data: bool = False) -> str:
+    listing = ''.join(
+        CARD_TEMPLATE.format(i=i, id=1000000 + i, reviews=37 * i + 5, price=f"{9 + i}.99") for i in range(cards)
+    )
+    filler = '<div class="wt-grid__item-xs-6"><a href="/c/jewelry">Jewelry</a></div>' * 200
+    head = '<script>var state = {};</script>'
+    if structured_data:
+        # The schema.org ItemList Etsy embeds in search pages
+        item_list = {'@context': 'https://schema.org', '@type': 'ItemList', 'itemListElement': [{
+            '@type': 'Product', 'position': i + 1,
+            'name': f"Personalized Vintage Necklace Boho Gift {i}",
+            'url': f"https://www.etsy.com/listing/{1000000 + i}/handmade-item-{i}",
+            'image': f"https://i.etsystatic.com/{1000000 + i}/il_340x270.jpg",
+            'brand': {'@type': 'Brand', 'name': f"Shop{i}Studio"},
+            'offers': {'@type': 'Offer', 'price': f"{9 + i}.99", 'priceCurrency': 'USD'}
+        } for i in range(cards)]}
+        head += f'<script type="application/ld+json">{json.dumps(item_list)}</script>'
+    return f"""<!DOCTYPE html><html><head><title>Search</title>{head}</head>
+<body><header>{filler}</header><main><ol class="wt-grid">{listing}</ol></main><footer>{filler}</footer></body></html>"""
+
+def product_fields(products):
+    # The mocked fields are random, compare only what is scraped
+    return [(p.title, p.price, p.shop_name, p.url, p.image_url, p.is_star_seller, p.is_best_seller, p.keywords)
+            for p in products]
+
+def select_one_chains(container):
+    """The per-field select_one walk parse_product_container did before the compiled plan"""
+    evaluated = {}
+    # In the plan's current order: adaptive selectors may have reordered it
+    for field, selectors in CONTAINER_PLAN.chains.items():
+        accept = PRODUCT_FIELD_ACCEPT.get(field)
+        for selector in selectors:
+            elem = evaluated[selector] = container.select_one(selector)
+            if elem and accept and accept(elem):
+                break
+    return evaluated
+
+def time_call(fn, rounds: int) -> float:
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1000
+
+def benchmark_backends(name: str, html: str, rounds: int):
+    print(f"\n📄 {name}: {len(html):,} characters, {rounds} rounds per backend")
+    print(f"{'backend':<12} {'parse ms':>10} {'products ms':>12} {'trending ms':>12} {'speedup':>8}  output")
+
+    scraper = EtsyScraper(bot_manager, None)
+    baseline = None
+    reference = None
+    for backend in PARSER_BACKENDS:
+        scraper.parser_backend = backend
+        trending = TrendingKeywordsManager(parser_backend=backend)
+
+        random.seed(0)
+        output = (
+            product_fields(scraper.extract_product_data(html, 'gift')),
+            sorted(asyncio.run(trending.extract_trending_from_listings(html)))
+        )
+        reference = reference or output
+
+        parse_ms = time_call(lambda: parse_html(html, backend), rounds)
+        products_ms = time_call(lambda: scraper.extract_product_data(html, 'gift'), rounds)
+        trending_ms = time_call(lambda: asyncio.run(trending.extract_trending_from_listings(html)), rounds)
+        total = products_ms + trending_ms
+        baseline = baseline or total
+
+        same = "✅ identical" if output == reference else "❌ differs"
+        print(f"{backend:<12} {parse_ms:>10.2f} {products_ms:>12.2f} {trending_ms:>12.2f} {baseline / total:>7.1f}x  {same}")
+
+def benchmark_container_plan(html: str, rounds: int):
+    print(f"\n🧩 Listing card fields, {rounds} rounds: select_one chains vs compiled single-pass plan")
+    print(f"{'backend':<12} {'cards':>6} {'select_one ms':>14} {'plan ms':>9} {'speedup':>8}  output")
+
+    ident = lambda node: getattr(node, 'element', node)
+    for backend in PARSER_BACKENDS:
+        cards = parse_html(html, backend).select('div[data-test-id="organic-search-result"]')[:20]
+        # Every selector the walk or the plan evaluated must give select_one's element
+        same = True
+        for card in cards:
+            planned = CONTAINER_PLAN.first_matches(card)
+            for selector in set(select_one_chains(card)) | set(planned):
+                same = same and ident(planned.get(selector)) is ident(card.select_one(selector))
+        chains_ms = time_call(lambda: [select_one_chains(card) for card in cards], rounds)
+        plan_ms = time_call(lambda: [CONTAINER_PLAN.first_matches(card) for card in cards], rounds)
+        verdict = "✅ identical" if same else "❌ differs"
+        print(f"{backend:<12} {len(cards):>6} {chains_ms:>14.2f} {plan_ms:>9.2f} {chains_ms / plan_ms:>7.1f}x  {verdict}")
+
+def benchmark_trending_plan(name: str, html: str, rounds: int):
+    print(f"\n🔥 Trending selectors on {name}, {rounds} rounds: one select per selector vs single traversal")
+    print(f"{'backend':<12} {'select ms':>10} {'plan ms':>8} {'speedup':>8}  output")
+
+    ident = lambda node: getattr(node, 'element', node)
+    for backend in PARSER_BACKENDS:
+        doc = parse_html(html, backend)
+        selected = {s: [ident(n) for n in doc.select(s)] for s in TRENDING_PLAN.selectors}
+        planned = {s: [ident(n) for n in nodes] for s, nodes in TRENDING_PLAN.select_all(doc).items()}
+        same = all(len(selected[s]) == len(planned[s]) and all(a is b for a, b in zip(selected[s], planned[s]))
+                   for s in TRENDING_PLAN.selectors)
+        select_ms = time_call(lambda: [doc.select(s) for s in TRENDING_PLAN.selectors], rounds)
+        plan_ms = time_call(lambda: TRENDING_PLAN.select_all(doc), rounds)
+        verdict = "✅ identical" if same else "❌ differs"
+        print(f"{backend:<12} {select_ms:>10.2f} {plan_ms:>8.2f} {select_ms / plan_ms:>7.1f}x  {verdict}")
+
+def benchmark_scoped_parse(html: str, rounds: int):
+    region = results_region(html)
+    print(f"\n✂️ Scoped parse: {len(region):,} of {len(html):,} characters parsed, {rounds} rounds")
+    print(f"{'backend':<12} {'full ms':>9} {'scoped ms':>10} {'speedup':>8}  output")
+
+    for backend in PARSER_BACKENDS:
+        outputs = []
+        for scoped in (False, True):
+            random.seed(0)
+            outputs.append(extract_products(html, 'gift', backend, scoped))
+        full_ms = time_call(lambda: extract_products(html, 'gift', backend, False), rounds)
+        scoped_ms = time_call(lambda: extract_products(html, 'gift', backend, True), rounds)
+        same = "✅ identical" if outputs[0] == outputs[1] else "❌ differs"
+        print(f"{backend:<12} {full_ms:>9.2f} {scoped_ms:>10.2f} {full_ms / scoped_ms:>7.1f}x  {same}")
+
+def benchmark_structured_data(html: str, rounds: int):
+    print(f"\n🗂️ JSON-LD fast path vs DOM walk, {rounds} rounds")
+    print(f"{'backend':<12} {'DOM ms':>8} {'JSON-LD ms':>11} {'speedup':>8}  output")
+
+    # Price is left out: the DOM chain settles on the bare currency symbol for these cards
+    fields = lambda records: [(r['title'], r['shop_name'], r['url'], r['image_url'], r['is_star_seller'],
+                               r['is_best_seller'], r['keywords']) for r in records]
+    for backend in PARSER_BACKENDS:
+        dom = extract_products(html, 'gift', backend, structured=False)
+        dom_ms = time_call(lambda: extract_products(html, 'gift', backend, structured=False), rounds)
+        # The fast path never parses, so its time is the same for every backend
+        structured_ms = time_call(lambda: extract_products(html, 'gift', backend, structured=True), rounds)
+        same = "✅ identical" if fields(dom) == fields(extract_products(html, 'gift', backend)) else "❌ differs"
+        print(f"{backend:<12} {dom_ms:>8.2f} {structured_ms:>11.2f} {dom_ms / structured_ms:>7.1f}x  {same}")
+
+def main():
+    path = sys.argv[1] if len(sys.argv) > 1 else 'etsy_sample_homepage.html'
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with open(path, encoding='utf-8') as f:
+        html = f.read()
+
+    search_page = synthetic_search_page()
+    benchmark_backends(path, html, rounds)
+    benchmark_backends("generated search page", search_page, rounds)
+    benchmark_container_plan(search_page, rounds)
+    benchmark_trending_plan(path, html, rounds)
+    benchmark_trending_plan("generated search page", search_page, rounds)
+    benchmark_scoped_parse(search_page, rounds)
+    benchmark_structured_data(synthetic_search_page(structured_data=True), rounds)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+"""
+Codecs for cached search results
+
+Every encoded entry starts with a header: MAGIC, the format version, the
+codec id and the compression id. Entries written before the header existed
+(plain JSON text) are still decoded.
+"""
+
+import json
+import logging
+import struct
+import zlib
+from typing import Any, Callable, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'\xecC'
+FORMAT_VERSION = 1
+
+Records = List[Dict[str, Any]]
+
+# Binary codec: field names once, then one tagged value per field and record
+_NONE, _FALSE, _TRUE, _INT, _FLOAT, _STR, _LIST, _ABSENT = range(8)
+_DOUBLE = struct.Struct('<d')
+_MISSING = object()  # decoded from _ABSENT: the record has no such field
+_CONSTANTS = {_NONE: None, _FALSE: False, _TRUE: True, _ABSENT: _MISSING}
+
+def _write_varint(out: bytearray, value: int):
+    while value > 0x7f:
+        out.append((value & 0x7f) | 0x80)
+        value >>= 7
+    out.append(value)
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7f) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def _write_str(out: bytearray, text: str):
+    encoded = text.encode('utf-8')
+    _write_varint(out, len(encoded))
+    out += encoded
+
+def _write_value(out: bytearray, value: Any):
+    if value is None:
+        out.append(_NONE)
+    elif value is True or value is False:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        _write_varint(out, value << 1 if value >= 0 else (-value << 1) - 1)  # zigzag
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(out, len(value))
+        for item in value:
+            _write_value(out, item)
+    else:
+        # Anything else is stored as text, like json.dumps(default=str)
+        out.append(_STR)
+        _write_str(out, value if isinstance(value, str) else str(value))
+
+def _read_value(data: bytes, pos: int) -> Tuple[Any, int]:
+    tag = data[pos]
+    pos += 1
+    if tag == _STR:
+        length, pos = _read_varint(data, pos)
+        return data[pos:pos + length].decode('utf-8'), pos + length
+    if tag == _INT:
+        raw, pos = _read_varint(data, pos)
+        return (raw >> 1) if not raw & 1 else -((raw + 1) >> 1), pos
+    if tag == _FLOAT:
+        return _DOUBLE.unpack_from(data, pos)[0], pos + _DOUBLE.size
+    if tag == _LIST:
+        count, pos = _read_varint(data, pos)
+        items = []
+        for _ in range(count):
+            item, pos = _read_value(data, pos)
+            items.append(item)
+        return items, pos
+    if tag in _CONSTANTS:
+        return _CONSTANTS[tag], pos
+    raise ValueError(f"Unknown value tag {tag}")
+
+def encode_binary(records: Records) -> bytes:
+    fields = list(dict.fromkeys(field for record in records for field in record))
+    out = bytearray()
+    _write_varint(out, len(fields))
+    for field in fields:
+        _write_str(out, field)
+    _write_varint(out, len(records))
+    for record in records:
+        for field in fields:
+            if field in record:
+                _write_value(out, record[field])
+            else:
+                out.append(_ABSENT)
+    return bytes(out)
+
+def decode_binary(data: bytes) -> Records:
+    count, pos = _read_varint(data, 0)
+    fields = []
+    for _ in range(count):
+        length, pos = _read_varint(data, pos)
+        fields.append(data[pos:pos + length].decode('utf-8'))
+        pos += length
+    count, pos = _read_varint(data, pos)
+    records = []
+    for _ in range(count):
+        record = {}
+        for field in fields:
+            value, pos = _read_value(data, pos)
+            if value is not _MISSING:
+                record[field] = value
+        records.append(record)
+    return records
+
+def encode_json(records: Records) -> bytes:
+    return json.dumps(records, default=str, separators=(',', ':')).encode('utf-8')
+
+def decode_json(data: bytes) -> Records:
+    return json.loads(data)
+
+CODECS: Dict[str, Tuple[int, Callable[[Records], bytes], Callable[[bytes], Records]]] = {
+    'json': (1, encode_json, decode_json),
+    'binary': (2, encode_binary, decode_binary),
+}
+
+def _zstd():
+    import zstandard
+    return zstandard
+
+COMPRESSIONS: Dict[str, Tuple[int, Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    'none': (0, lambda data: data, lambda data: data),
+    'zlib': (1, lambda data: zlib.compress(data, 6), zlib.decompress),
+    'zstd': (2, lambda data: _zstd().ZstdCompressor(level=3).compress(data),
+             lambda data: _zstd().ZstdDecompressor().decompress(data)),
+}
+
+_DECODERS = {codec_id: decode for codec_id, _, decode in CODECS.values()}
+_DECOMPRESSORS = {compression_id: decompress for compression_id, _, decompress in COMPRESSIONS.values()}
+
+def zstd_available() -> bool:
+    try:
+        _zstd()
+        return True
+    except ImportError:
+        return False
+
+class CacheCodec:
+    """Encodes records with one codec and compression; decodes entries written with any of them"""
+
+    def __init__(self, codec: str = 'json', compression: str = 'zlib'):
+        if codec not in CODECS:
+            raise ValueError(f"Unknown cache codec '{codec}', expected one of {list(CODECS)}")
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown cache compression '{compression}', expected one of {list(COMPRESSIONS)}")
+        if compression == 'zstd' and not zstd_available():
+            logger.warning("zstandard is not installed, compressing cache entries with zlib")
+            compression = 'zlib'
+        self.codec = codec
+        self.compression = compression
+        codec_id, self._encode, _ = CODECS[codec]
+        compression_id, self._compress, _ = COMPRESSIONS[compression]
+        self._header = MAGIC + bytes([FORMAT_VERSION, codec_id, compression_id])
+
+    def encode(self, records: Records) -> bytes:
+        return self._header + self._compress(self._encode(records))
+
+    @staticmethod
+    def decode(data) -> Records:
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+        if not data.startswith(MAGIC):
+            # Written before the header existed: plain JSON text
+            return json.loads(data)
+        version, codec_id, compression_id = data[2], data[3], data[4]
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unsupported cache entry format version {version}")
+        if codec_id not in _DECODERS or compression_id not in _DECOMPRESSORS:
+            raise ValueError(f"Unknown cache entry codec {codec_id} or compression {compression_id}")
+        return _DECODERS[codec_id](_DECOMPRESSORS[compression_id](data[5:]))
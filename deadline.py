@@ -0,0 +1,32 @@
+"""
+End-to-end time budgets for requests
+"""
+
+import time
+from typing import Optional
+
+class DeadlineExceeded(Exception):
+    """Raised when a request's time budget runs out"""
+
+class Deadline:
+    """Absolute expiry time passed down through every stage of a request"""
+
+    def __init__(self, timeout: float):
+        self.timeout = timeout
+        self.expires_at = time.monotonic() + timeout
+
+    def remaining(self) -> float:
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return time.monotonic() >= self.expires_at
+
+    def check(self, stage: str = "request"):
+        if self.expired:
+            raise DeadlineExceeded(f"Time budget of {self.timeout}s exhausted during {stage}")
+
+    def cap(self, seconds: Optional[float]) -> float:
+        """Clip a stage timeout to what is left of the budget"""
+        remaining = self.remaining()
+        return remaining if seconds is None else min(seconds, remaining)
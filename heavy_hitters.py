@@ -0,0 +1,196 @@
+"""
+Most frequent keywords of an unbounded stream, in fixed memory
+"""
+
+import hashlib
+import logging
+import math
+from array import array
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Iterable, List, Mapping, Union
+
+logger = logging.getLogger(__name__)
+
+@lru_cache(maxsize=8192)
+def _hash_pair(key: str):
+    # blake2b rather than hash(): cells must agree across worker processes
+    digest = hashlib.blake2b(key.encode('utf-8'), digest_size=16).digest()
+    return int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+
+class CountMinSketch:
+    """`depth` rows of `width` counters; a key's estimate is its smallest counter.
+
+    Estimates never undercount. With width = ceil(e / epsilon) and
+    depth = ceil(ln(1 / delta)), they overcount by more than epsilon times
+    the total only with probability delta. Sketches of the same size merge
+    by adding their counters.
+    """
+
+    def __init__(self, width: int, depth: int):
+        self.width = width
+        self.depth = depth
+        self.counters = array('q', bytes(8 * width * depth))
+        self.total = 0
+
+    @classmethod
+    def for_error(cls, epsilon: float, delta: float) -> 'CountMinSketch':
+        if not 0 < epsilon < 1 or not 0 < delta < 1:
+            raise ValueError("Sketch epsilon and delta must be between 0 and 1")
+        return cls(math.ceil(math.e / epsilon), math.ceil(math.log(1 / delta)))
+
+    def cells(self, key: str) -> List[int]:
+        """Index of the key's counter in each row (double hashing)"""
+        first, second = _hash_pair(key)
+        width = self.width
+        return [row * width + (first + row * second) % width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1, cells: List[int] = None) -> int:
+        """Count `key` and return its new estimate"""
+        counters = self.counters
+        cells = cells or self.cells(key)
+        for cell in cells:
+            counters[cell] += count
+        self.total += count
+        return min(map(counters.__getitem__, cells))
+
+    def estimate(self, key: str) -> int:
+        return min(map(self.counters.__getitem__, self.cells(key)))
+
+    def merge(self, other: 'CountMinSketch'):
+        if (other.width, other.depth) != (self.width, self.depth):
+            raise ValueError("Only sketches of the same width and depth can be merged")
+        counters = self.counters
+        for cell, count in enumerate(other.counters):
+            if count:
+                counters[cell] += count
+        self.total += other.total
+
+    def nonzero(self) -> Dict[int, int]:
+        return {cell: count for cell, count in enumerate(self.counters) if count}
+
+class HeavyHitters:
+    """Top-k keywords by Count-Min estimate, shared by the workers through Redis.
+
+    Memory is the sketch (twice: the counts seen so far and those not yet
+    flushed) plus `k` candidates, whatever the vocabulary. `flush` adds the
+    unflushed counts to a Redis hash holding everyone's sketch, then reads
+    it back, so each worker's top-k covers the keywords seen by all of them.
+    Without Redis the counts stay local.
+    """
+
+    def __init__(self, epsilon: float = 0.001, delta: float = 0.01, k: int = 100,
+                 key: str = "heavy_hitters", candidate_factor: int = 4):
+        self.epsilon = epsilon
+        self.delta = delta
+        self.k = k
+        self.sketch = CountMinSketch.for_error(epsilon, delta)
+        self.pending = CountMinSketch(self.sketch.width, self.sketch.depth)
+        # Keys are per sketch size, so a new epsilon or delta never mixes with old counters
+        prefix = f"{key}:{self.sketch.width}x{self.sketch.depth}"
+        self.cells_key = f"{prefix}:cells"
+        self.total_key = f"{prefix}:total"
+        self.candidates_key = f"{prefix}:candidates"
+        # Keywords kept in Redis for every worker to re-estimate, beyond each one's top k
+        self.shared_candidates = k * candidate_factor
+        self.redis_client = None
+        self.top: Dict[str, int] = {}
+        self._floor = 0  # no candidate is below this; a lower estimate cannot enter the top k
+        self.stats = {'flushes': 0, 'flush_errors': 0}
+
+    def add(self, key: str, count: int = 1):
+        cells = self.sketch.cells(key)
+        self.pending.add(key, count, cells)
+        self._offer(key, self.sketch.add(key, count, cells))
+
+    def update(self, counts: Union[Mapping[str, int], Iterable[str]]):
+        """Count a mapping of keyword counts, or every keyword of an iterable"""
+        # Repeats are added up first: one sketch update per distinct keyword
+        if not isinstance(counts, Mapping):
+            counts = Counter(counts)
+        for key, count in counts.items():
+            if count > 0:
+                self.add(key, count)
+
+    def _offer(self, key: str, estimate: int):
+        top = self.top
+        if key in top or len(top) < self.k:
+            top[key] = estimate
+            return
+        if estimate <= self._floor:
+            return
+        smallest = min(top, key=top.get)
+        self._floor = top[smallest]
+        if estimate > self._floor:
+            del top[smallest]
+            top[key] = estimate
+            self._floor = min(top.values())
+
+    def error_bound(self) -> float:
+        """Estimates exceed true counts by at most this much, with probability 1 - delta"""
+        return self.epsilon * self.sketch.total
+
+    def top_k(self, limit: int = None) -> List[Dict]:
+        ranked = sorted(self.top.items(), key=lambda item: -item[1])[:limit or self.k]
+        return [{'keyword': key, 'estimate': estimate} for key, estimate in ranked]
+
+    def _rank(self, keys: Iterable[str]):
+        estimates = {key: self.sketch.estimate(key) for key in keys}
+        self.top = dict(sorted(estimates.items(), key=lambda item: -item[1])[:self.k])
+        self._floor = min(self.top.values()) if len(self.top) >= self.k else 0
+        return estimates
+
+    async def flush(self):
+        """Add the counts seen since the last flush to Redis and adopt the merged sketch"""
+        if not self.redis_client:
+            self.pending = CountMinSketch(self.sketch.width, self.sketch.depth)
+            return
+        delta, self.pending = self.pending, CountMinSketch(self.sketch.width, self.sketch.depth)
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            for cell, count in delta.nonzero().items():
+                pipe.hincrby(self.cells_key, cell, count)
+            pipe.incrby(self.total_key, delta.total)
+            pipe.hgetall(self.cells_key)
+            pipe.zrevrange(self.candidates_key, 0, -1)
+            *_, total, cells, candidates = await pipe.execute()
+        except Exception as e:
+            # Kept for the next flush; the local sketch already has them
+            self.pending.merge(delta)
+            self.stats['flush_errors'] += 1
+            logger.error(f"Heavy hitters flush error: {str(e)}")
+            return
+
+        merged = CountMinSketch(self.sketch.width, self.sketch.depth)
+        for cell, count in cells.items():
+            merged.counters[int(cell)] = int(count)
+        merged.total = int(total)
+        # Counted while the flush was in flight: not in Redis yet
+        merged.merge(self.pending)
+        self.sketch = merged
+        names = {name.decode('utf-8') if isinstance(name, bytes) else name for name in candidates}
+        estimates = self._rank(names | set(self.top))
+        self.stats['flushes'] += 1
+
+        try:
+            shared = sorted(estimates.items(), key=lambda item: -item[1])[:self.shared_candidates]
+            pipe = self.redis_client.pipeline(transaction=False)
+            if shared:
+                pipe.zadd(self.candidates_key, dict(shared))
+            pipe.zremrangebyrank(self.candidates_key, 0, -self.shared_candidates - 1)
+            await pipe.execute()
+        except Exception as e:
+            logger.error(f"Heavy hitters candidates save error: {str(e)}")
+
+    def status(self) -> Dict:
+        return {
+            'epsilon': self.epsilon,
+            'delta': self.delta,
+            'width': self.sketch.width,
+            'depth': self.sketch.depth,
+            'total': self.sketch.total,
+            'error_bound': round(self.error_bound(), 1),
+            'candidates': len(self.top),
+            'memory_bytes': 2 * self.sketch.counters.itemsize * len(self.sketch.counters),
+            **self.stats
+        }
@@ -0,0 +1,60 @@
+"""
+Latency tracking and budget for hedged requests
+"""
+
+import math
+from collections import deque
+from typing import Dict, Optional
+
+class LatencyTracker:
+    """Sliding window of recent fetch latencies"""
+
+    def __init__(self, window: int = 500, min_samples: int = 20):
+        self.samples = deque(maxlen=window)
+        self.min_samples = min_samples
+
+    def record(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency below which a fraction `q` of recent fetches finished, or None until warmed up"""
+        if len(self.samples) < self.min_samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, max(0, math.ceil(q * len(ordered)) - 1))
+        return ordered[index]
+
+class HedgeBudget:
+    """Caps hedges to a fraction of primary requests.
+
+    Every primary request earns `ratio` of a hedge credit (up to `burst`
+    credits); sending a hedge spends a whole one.
+    """
+
+    def __init__(self, ratio: float = 0.1, burst: float = 3):
+        self.ratio = ratio
+        self.burst = burst
+        self.credits = burst
+        self.hedges_sent = 0
+        self.hedge_wins = 0
+        self.denied = 0
+
+    def earn(self):
+        self.credits = min(self.burst, self.credits + self.ratio)
+
+    def try_spend(self) -> bool:
+        if self.credits >= 1:
+            self.credits -= 1
+            self.hedges_sent += 1
+            return True
+        self.denied += 1
+        return False
+
+    def status(self) -> Dict:
+        return {
+            'ratio': self.ratio,
+            'credits': round(self.credits, 2),
+            'hedges_sent': self.hedges_sent,
+            'hedge_wins': self.hedge_wins,
+            'denied': self.denied
+        }
@@ -0,0 +1,518 @@
+"""
+Pluggable HTML parser backends for the scrapers
+
+Backends:
+- 'html.parser': BeautifulSoup with Python's built-in parser (slowest, no C deps)
+- 'lxml':        BeautifulSoup on top of the lxml C parser
+- 'lxml-xpath':  lxml tree queried directly through XPath, no BeautifulSoup objects
+
+All three return a document exposing the small part of the BeautifulSoup API
+the scrapers use (select, select_one, find, get_text, get, [attr]), so the
+extraction code is the same whichever backend is configured.
+"""
+
+import re
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional
+
+from bs4 import BeautifulSoup, Tag
+
+PARSER_BACKENDS = ('html.parser', 'lxml', 'lxml-xpath')
+
+# BeautifulSoup's get_text skips strings inside these (Script, Stylesheet, TemplateString)
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+def parse_html(html: str, backend: str = 'html.parser'):
+    """Parse `html` with the given backend and return the document root"""
+    if backend == 'lxml-xpath':
+        return LxmlNode(_lxml_document(html))
+    if backend in PARSER_BACKENDS:
+        return BeautifulSoup(html, backend)
+    raise ValueError(f"Unknown parser backend '{backend}', expected one of {PARSER_BACKENDS}")
+
+def _lxml_document(html: str):
+    import lxml.html
+    from lxml.etree import ParserError
+
+    try:
+        return lxml.html.document_fromstring(html)
+    except ValueError:
+        # Unicode strings with an XML encoding declaration are rejected
+        return lxml.html.document_fromstring(html.encode('utf-8'))
+    except ParserError:
+        # Empty document
+        return lxml.html.document_fromstring('<html></html>')
+
+class LxmlNode:
+    """Thin BeautifulSoup-compatible wrapper around an lxml element"""
+
+    __slots__ = ('element',)
+
+    def __init__(self, element):
+        self.element = element
+
+    @property
+    def name(self) -> str:
+        return self.element.tag
+
+    def select(self, selector: str) -> List['LxmlNode']:
+        return [LxmlNode(e) for e in css_to_xpath(selector)(self.element)]
+
+    def select_one(self, selector: str) -> Optional['LxmlNode']:
+        matches = css_to_xpath(selector)(self.element)
+        return LxmlNode(matches[0]) if matches else None
+
+    def find(self, name: str, attrs: Optional[dict] = None) -> Optional['LxmlNode']:
+        predicates = ''.join(f'[@{key}={_xpath_literal(value)}]' for key, value in (attrs or {}).items())
+        matches = self.element.xpath(f'descendant::{name}{predicates}[1]')
+        return LxmlNode(matches[0]) if matches else None
+
+    def get_text(self, separator: str = '', strip: bool = False) -> str:
+        strings = _text_strings(self.element)
+        if strip:
+            strings = (s.strip() for s in strings)
+            strings = [s for s in strings if s]
+        return separator.join(strings)
+
+    def get(self, key: str, default=None):
+        return self.element.get(key, default)
+
+    def __getitem__(self, key: str) -> str:
+        value = self.element.get(key)
+        if value is None:
+            raise KeyError(key)
+        return value
+
+    def __eq__(self, other) -> bool:
+        return isinstance(other, LxmlNode) and other.element is self.element
+
+    def __hash__(self) -> int:
+        return hash(self.element)
+
+def _text_strings(element):
+    """Text nodes under `element` in document order, skipping comments and script/style/template"""
+    if element.text:
+        yield element.text
+    for child in element:
+        if isinstance(child.tag, str) and child.tag not in NON_TEXT_TAGS:
+            yield from _text_strings(child)
+        if child.tail:
+            yield child.tail
+
+# CSS selector subset -> XPath
+# Supports type/universal selectors, .class, #id, [attr], [attr=v], [attr*=v],
+# [attr^=v], [attr$=v], [attr~=v] and the ' ', '>', '+', '~' combinators.
+
+_TOKEN_RE = re.compile(r"""
+    \s*(?P<combinator>[>+~])\s*
+  | (?P<space>\s+)
+  | (?P<tag>\*|[a-zA-Z][\w-]*)
+  | \.(?P<cls>[\w-]+)
+  | \#(?P<id>[\w-]+)
+  | \[\s*(?P<attr>[\w:-]+)\s*(?:(?P<op>[*^$~|]?=)\s*(?:"(?P<dq>[^"]*)"|'(?P<sq>[^']*)'|(?P<bare>[\w-]+))\s*)?\]
+""", re.VERBOSE)
+
+def _xpath_literal(value: str) -> str:
+    if '"' not in value:
+        return f'"{value}"'
+    if "'" not in value:
+        return f"'{value}'"
+    parts = value.split('"')
+    return 'concat(' + ', \'"\', '.join(f'"{p}"' for p in parts) + ')'
+
+def _attr_predicate(name: str, op: Optional[str], value: Optional[str]) -> str:
+    attr = f'@{name}'
+    if op is None:
+        return f'[{attr}]'
+    literal = _xpath_literal(value)
+    if op == '=':
+        return f'[{attr}={literal}]'
+    if not value and op in ('*=', '^=', '$='):
+        return '[false()]'
+    if op == '*=':
+        return f'[contains({attr}, {literal})]'
+    if op == '^=':
+        return f'[starts-with({attr}, {literal})]'
+    if op == '$=':
+        return f'[substring({attr}, string-length({attr}) - {len(value) - 1})={literal}]'
+    if op == '~=':
+        return f'[contains(concat(" ", normalize-space({attr}), " "), {_xpath_literal(" " + value + " ")})]'
+    if op == '|=':
+        return f'[{attr}={literal} or starts-with({attr}, {_xpath_literal(value + "-")})]'
+    raise ValueError(f"Unsupported attribute operator '{op}'")
+
+def parse_css(selector: str):
+    """Split a selector into [(combinator, tag, predicates)] from left to right"""
+    compounds = []
+    combinator = None
+    tag, predicates = None, []
+    pos = 0
+    selector = selector.strip()
+    while pos < len(selector):
+        match = _TOKEN_RE.match(selector, pos)
+        if not match:
+            raise ValueError(f"Unsupported CSS selector '{selector}' at position {pos}")
+        pos = match.end()
+        if match.group('combinator') or match.group('space'):
+            if tag is None and not predicates:
+                # Whitespace around an explicit combinator
+                combinator = match.group('combinator') or combinator
+                continue
+            compounds.append((combinator, tag or '*', predicates))
+            combinator = match.group('combinator') or ' '
+            tag, predicates = None, []
+        elif match.group('tag'):
+            tag = match.group('tag').lower()
+        elif match.group('cls'):
+            predicates.append(('~=', 'class', match.group('cls')))
+        elif match.group('id'):
+            predicates.append(('=', 'id', match.group('id')))
+        else:
+            value = next((v for v in match.group('dq', 'sq', 'bare') if v is not None), None)
+            predicates.append((match.group('op'), match.group('attr').lower(), value))
+    compounds.append((combinator, tag or '*', predicates))
+    return compounds
+
+def _context_predicate(compounds, index: int) -> str:
+    """Predicate requiring compounds[:index] to match around the element of compounds[index]"""
+    combinator = compounds[index][0]
+    if combinator is None:
+        return ''
+    _, tag, predicates = compounds[index - 1]
+    preds = ''.join(_attr_predicate(name, op, value) for op, name, value in predicates)
+    inner = preds + _context_predicate(compounds, index - 1)
+    if combinator == ' ':
+        return f'[ancestor::{tag}{inner}]'
+    if combinator == '>':
+        return f'[parent::{tag}{inner}]'
+    if combinator == '+':
+        self_test = '' if tag == '*' else f'[self::{tag}]'
+        return f'[preceding-sibling::*[1]{self_test}{inner}]'
+    return f'[preceding-sibling::{tag}{inner}]'
+
+@lru_cache(maxsize=512)
+def css_to_xpath(selector: str):
+    """Compile a CSS selector into an lxml XPath evaluator over descendants, in document order.
+
+    Combinators are resolved against ancestors and siblings anywhere in the
+    document, matching soupsieve's select() on a sub-element.
+    """
+    from lxml import etree
+
+    compounds = parse_css(selector)
+    _, tag, predicates = compounds[-1]
+    preds = ''.join(_attr_predicate(name, op, value) for op, name, value in predicates)
+    return etree.XPath(f'descendant::{tag}{preds}{_context_predicate(compounds, len(compounds) - 1)}')
+
+# Compiled single-pass extraction
+#
+# select_one() walks the whole subtree for every selector it is given. An
+# ExtractionPlan instead compiles a set of fallback chains into Python
+# matchers, buckets them by the tag or class their rightmost compound needs,
+# and finds the first match of every selector in one walk of the container.
+
+class _SoupOps:
+    """Node access for BeautifulSoup trees"""
+
+    @staticmethod
+    def descendants(root):
+        for node in root.descendants:
+            if isinstance(node, Tag):
+                yield node
+
+    @staticmethod
+    def name(node):
+        return node.name
+
+    @staticmethod
+    def attr(node, key):
+        value = node.attrs.get(key)
+        if isinstance(value, list):
+            return ' '.join(value)
+        return value
+
+    @staticmethod
+    def parent(node):
+        parent = node.parent
+        return parent if parent is not None and parent.name != '[document]' else None
+
+    @staticmethod
+    def previous(node):
+        sibling = node.previous_sibling
+        while sibling is not None and not isinstance(sibling, Tag):
+            sibling = sibling.previous_sibling
+        return sibling
+
+    @staticmethod
+    def wrap(node):
+        return node
+
+    # Tags hash by content, so identical siblings would collide
+    key = id
+
+class _LxmlOps:
+    """Node access for raw lxml elements"""
+
+    @staticmethod
+    def descendants(root):
+        for node in root.element.iterdescendants():
+            if isinstance(node.tag, str):
+                yield node
+
+    @staticmethod
+    def name(node):
+        return node.tag
+
+    @staticmethod
+    def attr(node, key):
+        return node.get(key)
+
+    @staticmethod
+    def parent(node):
+        return node.getparent()
+
+    @staticmethod
+    def previous(node):
+        sibling = node.getprevious()
+        while sibling is not None and not isinstance(sibling.tag, str):
+            sibling = sibling.getprevious()
+        return sibling
+
+    wrap = LxmlNode
+
+    @staticmethod
+    def key(node):
+        # The element itself: keeps its proxy alive so the identity stays valid
+        return node
+
+def _compile_compound(tag: str, predicates, ops):
+    checks = []
+    for op, key, value in predicates:
+        if op is None:
+            checks.append(lambda v, _: v is not None)
+        elif op == '=':
+            checks.append(lambda v, want: v == want)
+        elif op == '~=':
+            checks.append(lambda v, want: v is not None and want in v.split())
+        elif op == '*=':
+            checks.append(lambda v, want: bool(want) and v is not None and want in v)
+        elif op == '^=':
+            checks.append(lambda v, want: bool(want) and v is not None and v.startswith(want))
+        elif op == '$=':
+            checks.append(lambda v, want: bool(want) and v is not None and v.endswith(want))
+        elif op == '|=':
+            checks.append(lambda v, want: v is not None and (v == want or v.startswith(want + '-')))
+        else:
+            raise ValueError(f"Unsupported attribute operator '{op}'")
+    tests = [(check, key, value) for check, (op, key, value) in zip(checks, predicates)]
+    name, attr = ops.name, ops.attr
+
+    def match(node) -> bool:
+        if tag != '*' and name(node) != tag:
+            return False
+        for check, key, value in tests:
+            if not check(attr(node, key), value):
+                return False
+        return True
+    return match
+
+def compile_matcher(selector: str, ops):
+    """Compile a CSS selector into a predicate `match(node, memo)` on a single node.
+
+    `memo` caches, per traversal, whether an ancestor of a node matches the
+    left part of the selector, so descendant combinators cost O(1) amortised
+    instead of a walk to the root for every node.
+    """
+    compounds = parse_css(selector)
+    matchers = [(combinator, _compile_compound(tag, predicates, ops)) for combinator, tag, predicates in compounds]
+    parent, previous, node_key = ops.parent, ops.previous, ops.key
+    token = object()
+
+    def match_at(node, index: int, memo) -> bool:
+        combinator, compound = matchers[index]
+        if not compound(node):
+            return False
+        if combinator is None:
+            return True
+        if combinator == ' ':
+            return has_ancestor(parent(node), index - 1, memo)
+        if combinator == '>':
+            ancestor = parent(node)
+            return ancestor is not None and match_at(ancestor, index - 1, memo)
+        sibling = previous(node)
+        if combinator == '+':
+            return sibling is not None and match_at(sibling, index - 1, memo)
+        while sibling is not None:
+            if match_at(sibling, index - 1, memo):
+                return True
+            sibling = previous(sibling)
+        return False
+
+    def has_ancestor(node, index: int, memo) -> bool:
+        """Whether `node` or one of its ancestors matches compounds[:index + 1]"""
+        if node is None:
+            return False
+        key = (token, node_key(node), index)
+        hit = memo.get(key)
+        if hit is None:
+            hit = memo[key] = match_at(node, index, memo) or has_ancestor(parent(node), index, memo)
+        return hit
+
+    last = len(matchers) - 1
+    return lambda node, memo: match_at(node, last, memo)
+
+def _subject_key(selector: str):
+    """Bucket for the rightmost compound: a required class, else the tag, else any element"""
+    _, tag, predicates = parse_css(selector)[-1]
+    for op, key, value in predicates:
+        if op == '~=' and key == 'class':
+            return ('class', value)
+    return ('tag', tag) if tag != '*' else ('any', None)
+
+class ExtractionPlan:
+    """First match of every selector in a set of fallback chains, found in one traversal.
+
+    `chains` maps a field to its selectors in priority order. `accept` maps a
+    field to the check its caller applies to a selector's first match before
+    settling on it; a field with no check is evaluated exhaustively. Once a
+    field has an accepted match, its lower-priority selectors are no longer
+    tested. The result maps each needed selector to the same element
+    container.select_one(selector) would return (missing when there is none).
+    """
+
+    def __init__(self, chains: Dict[str, List[str]], accept: Optional[Dict[str, Callable]] = None):
+        self.chains = {field: list(selectors) for field, selectors in chains.items()}
+        self.accept = accept or {}
+        self._compiled = {}
+        self._buckets_by_ops = {}
+
+    def reorder(self, field: str, selectors: List[str]):
+        """Change a field's priority order (same selectors, new order)"""
+        if sorted(selectors) != sorted(self.chains[field]):
+            raise ValueError(f"Reordered chain for '{field}' must contain the same selectors")
+        self.chains[field] = list(selectors)
+        self._buckets_by_ops = {}
+
+    def _buckets(self, ops):
+        buckets = self._buckets_by_ops.get(ops)
+        if buckets is not None:
+            return buckets
+        compiled = self._compiled.get(ops)
+        if compiled is None:
+            compiled = self._compiled[ops] = {}
+            for selectors in self.chains.values():
+                for selector in selectors:
+                    if selector not in compiled:
+                        compiled[selector] = (_subject_key(selector), compile_matcher(selector, ops))
+        buckets = {}
+        for field, selectors in self.chains.items():
+            for index, selector in enumerate(selectors):
+                key, match = compiled[selector]
+                buckets.setdefault(key, []).append((field, index, selector, match))
+        self._buckets_by_ops[ops] = buckets
+        return buckets
+
+    def first_matches(self, container) -> Dict[str, object]:
+        ops = _LxmlOps if isinstance(container, LxmlNode) else _SoupOps
+        buckets = self._buckets(ops)
+        any_bucket = buckets.get(('any', None), ())
+        found: Dict[str, object] = {}
+        # Index of the best accepted selector per field; lower-priority ones are not needed
+        settled = {field: len(selectors) for field, selectors in self.chains.items()}
+        open_fields = set(self.chains)
+        memo = {}
+        name, attr, wrap = ops.name, ops.attr, ops.wrap
+
+        def record(selector: str, node):
+            found[selector] = node = wrap(node)
+            for field, selectors in self.chains.items():
+                if selector not in selectors:
+                    continue
+                index = selectors.index(selector)
+                check = self.accept.get(field)
+                if check is not None and index < settled[field] and check(node):
+                    settled[field] = index
+                if field in open_fields and all(s in found for s in selectors[:settled[field] + 1]):
+                    open_fields.discard(field)
+
+        for node in ops.descendants(container):
+            candidates = list(buckets.get(('tag', name(node)), ()))
+            classes = attr(node, 'class')
+            if classes:
+                for cls in classes.split():
+                    candidates.extend(buckets.get(('class', cls), ()))
+            candidates.extend(any_bucket)
+
+            for field, index, selector, match in candidates:
+                if selector in found or field not in open_fields or index > settled[field]:
+                    continue
+                if match(node, memo):
+                    record(selector, node)
+            if not open_fields:
+                break
+        return found
+
+def _quick_check(selector: str):
+    """(attribute, substring) every match of `selector` has, from its rightmost compound, or (None, None)"""
+    _, _, predicates = parse_css(selector)[-1]
+    for op, key, value in predicates:
+        if not (op == '~=' and key == 'class'):  # already implied by the class bucket
+            return key, value or ''
+    return None, None
+
+class SelectionPlan:
+    """Every match of a set of selectors, found in one traversal.
+
+    Each element is visited once and tested only against the selectors whose
+    rightmost compound can match it (bucketed like ExtractionPlan), after a
+    cheap check of the attribute that compound needs. `select_all` returns,
+    per selector, the same elements root.select(selector) would, in
+    document order.
+    """
+
+    def __init__(self, selectors: List[str]):
+        self.selectors = list(dict.fromkeys(selectors))
+        self._buckets_by_ops = {}
+
+    def _buckets(self, ops):
+        buckets = self._buckets_by_ops.get(ops)
+        if buckets is None:
+            buckets = self._buckets_by_ops[ops] = {}
+            for selector in self.selectors:
+                key, needle = _quick_check(selector)
+                buckets.setdefault(_subject_key(selector), []).append(
+                    (selector, key, needle, compile_matcher(selector, ops))
+                )
+        return buckets
+
+    def select_all(self, root) -> Dict[str, list]:
+        ops = _LxmlOps if isinstance(root, LxmlNode) else _SoupOps
+        buckets = self._buckets(ops)
+        any_bucket = buckets.get(('any', None), [])
+        by_tag = {}
+        found = {selector: [] for selector in self.selectors}
+        memo = {}
+        name, attr, wrap = ops.name, ops.attr, ops.wrap
+
+        for node in ops.descendants(root):
+            tag = name(node)
+            candidates = by_tag.get(tag)
+            if candidates is None:
+                candidates = by_tag[tag] = buckets.get(('tag', tag), []) + any_bucket
+            classes = attr(node, 'class')
+            if classes:
+                by_class = [entry for cls in set(classes.split()) for entry in buckets.get(('class', cls), ())]
+                if by_class:
+                    candidates = candidates + by_class
+            # Attribute values are read once per element, whichever selectors test them
+            values = {'class': classes}
+            for selector, key, needle, match in candidates:
+                if key is not None:
+                    if key not in values:
+                        values[key] = attr(node, key)
+                    value = values[key]
+                    if value is None or needle not in value:
+                        continue
+                if match(node, memo):
+                    found[selector].append(wrap(node))
+        return found
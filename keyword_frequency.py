@@ -0,0 +1,125 @@
+"""
+Keyword occurrence counts over sliding time windows
+"""
+
+import heapq
+import time
+from collections import Counter, deque
+from operator import itemgetter
+from typing import Dict, Iterable, List, Mapping, Optional, Tuple
+
+_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+def parse_window(spec: str) -> float:
+    """Length in seconds of a window written as '90s', '15m', '1h', '7d' or plain seconds"""
+    spec = spec.strip().lower()
+    if spec[-1:] in _UNITS:
+        return float(spec[:-1]) * _UNITS[spec[-1]]
+    return float(spec)
+
+def parse_windows(specs: Iterable[str]) -> Dict[str, float]:
+    """Window names mapped to their length in seconds, e.g. ['1h', '24h'] -> {'1h': 3600.0, '24h': 86400.0}"""
+    return {spec.strip(): parse_window(spec) for spec in specs if spec.strip()}
+
+class SlidingWindowCounter:
+    """Counts of the last `window` seconds, kept in `buckets` slices of time.
+
+    An occurrence is added to the current slice and to the running totals;
+    a slice leaving the window is subtracted from the totals once. Both are
+    constant time per occurrence. The window moves a slice at a time, so it
+    covers between `window` and `window` plus one slice.
+    """
+
+    def __init__(self, window: float, buckets: int = 60):
+        self.window = window
+        self.buckets = buckets
+        self.width = window / buckets
+        self.slices: deque = deque()  # (slice number, Counter), oldest first
+        self.totals: Counter = Counter()
+        self.version = 0
+        self._top: Optional[Tuple[int, int, List[Tuple[str, int]]]] = None
+
+    def expire(self, now: float):
+        """Drop the slices that left the window"""
+        oldest = int(now // self.width) - self.buckets + 1
+        slices, totals = self.slices, self.totals
+        while slices and slices[0][0] < oldest:
+            for key, count in slices.popleft()[1].items():
+                remaining = totals[key] - count
+                if remaining > 0:
+                    totals[key] = remaining
+                else:
+                    del totals[key]
+            self.version += 1
+
+    def add(self, counts: Mapping[str, int], now: float):
+        number = int(now // self.width)
+        if not self.slices or self.slices[-1][0] < number:
+            self.expire(now)
+            self.slices.append((number, Counter()))
+        # A clock that went back counts into the newest slice
+        current, totals = self.slices[-1][1], self.totals
+        for key, count in counts.items():
+            current[key] += count
+            totals[key] += count
+        self.version += 1
+
+    def top(self, k: int, now: float) -> List[Tuple[str, int]]:
+        """The `k` most frequent keys with their counts, most frequent first"""
+        self.expire(now)
+        # Repeated reads between two updates are served from the last result
+        if self._top and self._top[0] == self.version and self._top[1] >= k:
+            return self._top[2][:k]
+        ranked = heapq.nlargest(k, self.totals.items(), key=itemgetter(1))
+        self._top = (self.version, k, ranked)
+        return ranked
+
+    def __len__(self) -> int:
+        return len(self.totals)
+
+class KeywordFrequencyStore:
+    """How often keywords occurred on scraped pages, over several sliding windows.
+
+    `record` takes the keyword counts of one page and adds them to every
+    window; `top` ranks the keywords of one window. Keywords are compared
+    title-cased and single-spaced, so "vintage  ring" and "Vintage Ring" are
+    one keyword.
+    """
+
+    def __init__(self, windows: Dict[str, float], buckets: int = 60):
+        if not windows:
+            raise ValueError("At least one keyword frequency window is required")
+        self.windows = {name: SlidingWindowCounter(seconds, buckets) for name, seconds in windows.items()}
+        self.stats = {'pages': 0, 'occurrences': 0}
+
+    @staticmethod
+    def normalize(keyword: str) -> str:
+        return ' '.join(keyword.split()).title()
+
+    def record(self, counts: Mapping[str, int], now: Optional[float] = None):
+        """Add one page's keyword occurrence counts to every window"""
+        normalized = Counter()
+        for keyword, count in counts.items():
+            keyword = self.normalize(keyword)
+            if keyword and count > 0:
+                normalized[keyword] += count
+        if not normalized:
+            return
+        now = time.time() if now is None else now
+        for counter in self.windows.values():
+            counter.add(normalized, now)
+        self.stats['pages'] += 1
+        self.stats['occurrences'] += sum(normalized.values())
+
+    def top(self, window: str, k: int = 20, now: Optional[float] = None) -> List[Dict]:
+        """The `k` most frequent keywords of a window; KeyError for an unknown window"""
+        ranked = self.windows[window].top(k, time.time() if now is None else now)
+        return [{'keyword': keyword, 'count': count} for keyword, count in ranked]
+
+    def status(self) -> Dict:
+        now = time.time()
+        windows = {}
+        for name, counter in self.windows.items():
+            counter.expire(now)
+            windows[name] = {'seconds': counter.window, 'keywords': len(counter)}
+        return {'windows': windows, **self.stats}
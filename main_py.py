@@ -4,23 +4,24 @@ Enhanced Etsy Research API with Cloudflare Integration
 
 import asyncio
 import aiohttp
-import json
-import random
+import math
 import time
 import os
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional
 from dataclasses import dataclass
-from bs4 import BeautifulSoup
-import re
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from collections import Counter, deque
+import unicodedata
 from urllib.parse import urlencode, quote_plus
 import logging
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Request
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
-import redis
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel, Field
+import redis.asyncio as aioredis
 from contextlib import asynccontextmanager
 from dotenv import load_dotenv
 import requests
@@ -28,7 +29,20 @@ from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 from proxy_manager import ProxyManager
 import cloudscraper
-from trending_keywords import TrendingKeywordsManager
+from trending_keywords import TrendingKeywordsManager, DEFAULT_TRENDING_KEYWORDS, title_tokens, parse_trending_sources
+from trending_service import TrendingService
+from keyword_frequency import KeywordFrequencyStore, parse_windows
+from heavy_hitters import HeavyHitters
+from single_flight import SingleFlight
+from rate_limiter import RateLimiter, AdaptiveConcurrencyController
+from deadline import Deadline, DeadlineExceeded
+from hedging import LatencyTracker, HedgeBudget
+from product_parsing import extract_products
+from parse_pool import ParsePool, ParsePoolBusy
+from parse_cache import ParseCache
+from tiered_cache import LocalCache, TieredCache
+from cache_codecs import CacheCodec
+from selector_stats import selector_registry
 
 # Load environment variables
 load_dotenv()
@@ -41,11 +55,83 @@ logger = logging.getLogger(__name__)
 CONFIG = {
     'PROXY_ENDPOINTS': os.getenv('CLOUDFLARE_FLOXY_ENDPOINTS', '').split(',') if os.getenv('CLOUDFLARE_FLOXY_ENDPOINTS') else [],
     'MAX_CONCURRENT_BOTS': int(os.getenv('MAX_CONCURRENT_BOTS', '5')),
-    'REQUEST_DELAY_RANGE': (2, 5),
+    # Token buckets: requests per second and burst size, across all bots and per bot
+    'GLOBAL_RATE_LIMIT': float(os.getenv('GLOBAL_RATE_LIMIT', '1.0')),
+    'GLOBAL_RATE_BURST': int(os.getenv('GLOBAL_RATE_BURST', '5')),
+    'BOT_RATE_LIMIT': float(os.getenv('BOT_RATE_LIMIT', '0.3')),
+    'BOT_RATE_BURST': int(os.getenv('BOT_RATE_BURST', '1')),
+    # AIMD backoff on 429/403: halve parallelism and rate, then grow back on success
+    'AIMD_DECREASE_FACTOR': float(os.getenv('AIMD_DECREASE_FACTOR', '0.5')),
+    'AIMD_COOLDOWN': float(os.getenv('AIMD_COOLDOWN', '10')),
     'REDIS_URL': os.getenv('REDIS_URL', 'redis://localhost:6379'),
+    # Shared async connection pool: size and socket timeouts in seconds
+    'REDIS_MAX_CONNECTIONS': int(os.getenv('REDIS_MAX_CONNECTIONS', '20')),
+    'REDIS_SOCKET_TIMEOUT': float(os.getenv('REDIS_SOCKET_TIMEOUT', '1.0')),
+    'REDIS_CONNECT_TIMEOUT': float(os.getenv('REDIS_CONNECT_TIMEOUT', '2.0')),
     'CACHE_EXPIRY': 3600,
+    # Cached searches older than this are still served, while one refresh runs in the background
+    'CACHE_SOFT_TTL': int(os.getenv('CACHE_SOFT_TTL', '900')),
+    # In-process cache in front of Redis: entries and seconds (kept below CACHE_EXPIRY)
+    'L1_CACHE_SIZE': int(os.getenv('L1_CACHE_SIZE', '256')),
+    'L1_CACHE_TTL': float(os.getenv('L1_CACHE_TTL', '60')),
+    # Redis pub/sub channel announcing cache writes to the other workers (empty to disable)
+    'CACHE_INVALIDATION_CHANNEL': os.getenv('CACHE_INVALIDATION_CHANNEL', 'etsy_search:invalidate'),
+    # Format of cached results in Redis: 'binary' or 'json', compressed with 'zlib', 'zstd' or 'none'
+    'CACHE_CODEC': os.getenv('CACHE_CODEC', 'json'),
+    'CACHE_COMPRESSION': os.getenv('CACHE_COMPRESSION', 'zlib'),
+    'INFLIGHT_MARKER_TTL': int(os.getenv('INFLIGHT_MARKER_TTL', '120')),
+    # Hedging: if a fetch is slower than this latency percentile, race a second idle bot
+    'HEDGE_ENABLED': os.getenv('HEDGE_ENABLED', 'false').lower() == 'true',
+    'HEDGE_PERCENTILE': float(os.getenv('HEDGE_PERCENTILE', '0.95')),
+    'HEDGE_BUDGET_RATIO': float(os.getenv('HEDGE_BUDGET_RATIO', '0.1')),
+    'DISCONNECT_POLL_INTERVAL': 0.5,
+    # HTML parser backend: 'html.parser', 'lxml' or 'lxml-xpath' (see html_parsing.py)
+    'PARSER_BACKEND': os.getenv('PARSER_BACKEND', 'lxml-xpath'),
+    # Parse only the organic results region of search pages instead of the whole document
+    'SCOPED_PARSE': os.getenv('SCOPED_PARSE', 'true').lower() == 'true',
+    # Read listings from the page's JSON-LD when present, skipping the DOM walk
+    'STRUCTURED_DATA': os.getenv('STRUCTURED_DATA', 'true').lower() == 'true',
+    # Parse worker processes (0 parses inline on the event loop) and how many pages may queue for them
+    'PARSE_WORKERS': int(os.getenv('PARSE_WORKERS', '2')),
+    'PARSE_QUEUE_SIZE': int(os.getenv('PARSE_QUEUE_SIZE', '32')),
+    # Memory for parse results of recently seen pages, keyed by content hash (0 disables it)
+    'PARSE_CACHE_BYTES': int(os.getenv('PARSE_CACHE_BYTES', str(8 * 1024 * 1024))),
+    # Reorder selector fallback chains by hit rate; the counts are kept in this file across restarts
+    'ADAPTIVE_SELECTORS': os.getenv('ADAPTIVE_SELECTORS', 'true').lower() == 'true',
+    'SELECTOR_STATS_FILE': os.getenv('SELECTOR_STATS_FILE', 'selector_stats.json'),
+    'SELECTOR_STATS_SAVE_INTERVAL': 300,
+    # Trending keywords are re-extracted from Etsy in the background this often (seconds),
+    # or after the retry delay when that fails
+    'TRENDING_REFRESH_INTERVAL': float(os.getenv('TRENDING_REFRESH_INTERVAL', '3600')),
+    'TRENDING_RETRY_DELAY': float(os.getenv('TRENDING_RETRY_DELAY', '120')),
+    # Pages trending keywords are harvested from, concurrently, as 'url|weight'
+    'TRENDING_SOURCES': parse_trending_sources(os.getenv(
+        'TRENDING_SOURCES',
+        'https://www.etsy.com/trending|3,https://www.etsy.com/|2,https://www.etsy.com/search?q=trending|1'
+    ).split(',')),
+    # Sliding windows over which keyword occurrences on scraped pages are counted,
+    # each kept in this many time slices
+    'KEYWORD_WINDOWS': os.getenv('KEYWORD_WINDOWS', '1h,24h,7d').split(','),
+    'KEYWORD_WINDOW_BUCKETS': int(os.getenv('KEYWORD_WINDOW_BUCKETS', '60')),
+    # Top title tokens of all time in fixed memory (Count-Min sketch): estimates exceed
+    # true counts by at most EPSILON x all tokens seen, except with probability DELTA.
+    # Workers merge their counts in Redis every FLUSH_INTERVAL seconds
+    'HEAVY_HITTER_EPSILON': float(os.getenv('HEAVY_HITTER_EPSILON', '0.001')),
+    'HEAVY_HITTER_DELTA': float(os.getenv('HEAVY_HITTER_DELTA', '0.01')),
+    'HEAVY_HITTER_TOP_K': int(os.getenv('HEAVY_HITTER_TOP_K', '100')),
+    'HEAVY_HITTER_FLUSH_INTERVAL': float(os.getenv('HEAVY_HITTER_FLUSH_INTERVAL', '30')),
     'MAX_RETRIES': 3,
     'RETRY_DELAY': 5,
+    'REQUEST_TIMEOUT': 30,
+    # End-to-end budget for one /api/search call, overridable per request up to the max
+    'SEARCH_TIMEOUT': float(os.getenv('SEARCH_TIMEOUT', '45')),
+    'MAX_SEARCH_TIMEOUT': float(os.getenv('MAX_SEARCH_TIMEOUT', '120')),
+    # Treat word order as insignificant in searches ("necklace vintage" shares "vintage necklace"'s cache entry)
+    'SORT_QUERY_TOKENS': os.getenv('SORT_QUERY_TOKENS', 'false').lower() == 'true',
+    # Threads for the blocking fetches; 0 sizes the pool from the global rate limit (see below)
+    'FETCH_WORKERS': int(os.getenv('FETCH_WORKERS', '0')),
+    'BOT_ACQUIRE_TIMEOUT': float(os.getenv('BOT_ACQUIRE_TIMEOUT', '15')),
+    'BOT_WAIT_QUEUE_SIZE': int(os.getenv('BOT_WAIT_QUEUE_SIZE', '50')),
     'USER_AGENTS': [
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
         'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/119.0.0.0 Safari/537.36',
@@ -58,6 +144,29 @@ CONFIG = {
 # Initialize proxy manager
 proxy_manager = ProxyManager()
 
+# cloudscraper is synchronous, so every fetch runs on this bounded pool instead
+# of the event loop. A fetch given up on (deadline, client disconnect, losing
+# hedge) frees its bot but keeps its thread until the socket times out, so the
+# pool is not sized to the bots: it holds every fetch the global rate limiter
+# can start within REQUEST_TIMEOUT (35 with the defaults).
+if CONFIG['FETCH_WORKERS'] <= 0:
+    CONFIG['FETCH_WORKERS'] = max(
+        CONFIG['MAX_CONCURRENT_BOTS'],
+        CONFIG['GLOBAL_RATE_BURST'] + math.ceil(CONFIG['GLOBAL_RATE_LIMIT'] * CONFIG['REQUEST_TIMEOUT'])
+    )
+fetch_executor = ThreadPoolExecutor(max_workers=CONFIG['FETCH_WORKERS'], thread_name_prefix='etsy-fetch')
+
+selector_registry.adaptive = CONFIG['ADAPTIVE_SELECTORS']
+
+# Parsing is CPU-bound, so pages are parsed in worker processes; started in lifespan
+parse_pool = ParsePool(CONFIG['PARSE_WORKERS'], CONFIG['PARSE_QUEUE_SIZE'], CONFIG['PARSER_BACKEND'])
+parse_cache = ParseCache(CONFIG['PARSE_CACHE_BYTES'])
+cache_codec = CacheCodec(CONFIG['CACHE_CODEC'], CONFIG['CACHE_COMPRESSION'])
+# Keyword counts of every scraped search and trending page, per sliding window
+keyword_frequencies = KeywordFrequencyStore(parse_windows(CONFIG['KEYWORD_WINDOWS']), CONFIG['KEYWORD_WINDOW_BUCKETS'])
+# Every title token of every scraped page, without keeping the vocabulary in memory
+heavy_hitters = HeavyHitters(CONFIG['HEAVY_HITTER_EPSILON'], CONFIG['HEAVY_HITTER_DELTA'], CONFIG['HEAVY_HITTER_TOP_K'])
+
 @dataclass
 class EtsyProduct:
     title: str
@@ -78,10 +187,23 @@ class SearchRequest(BaseModel):
     product_type: str
     filter_type: str = "star_seller"
     max_results: int = 20
+    timeout: Optional[float] = Field(None, gt=0)  # seconds; falls back to the X-Request-Timeout header
+
+def normalize_query(text: str, sort_tokens: bool = False) -> str:
+    """Canonical form of a search term: NFKC, case-folded, single-spaced"""
+    tokens = unicodedata.normalize('NFKC', text).casefold().split()
+    if sort_tokens:
+        tokens.sort()
+    return ' '.join(tokens)
 
 class Bot:
-    def __init__(self, bot_id: int):
+    def __init__(self, bot_id: int, rate_limiter: Optional[RateLimiter] = None,
+                 concurrency: Optional[AdaptiveConcurrencyController] = None,
+                 latency_tracker: Optional[LatencyTracker] = None):
         self.bot_id = bot_id
+        self.rate_limiter = rate_limiter
+        self.concurrency = concurrency
+        self.latency_tracker = latency_tracker
         self.session = None
         self.requests_session = None
         self.is_busy = False
@@ -133,26 +255,73 @@ class Bot:
         if self.requests_session:
             self.requests_session.close()
 
-    async def make_request(self, url: str, params: Dict = None) -> Optional[str]:
+    async def _fetch(self, url: str, params: Dict = None, deadline: Optional[Deadline] = None):
+        """Run the blocking cloudscraper GET on the fetch pool and await it"""
+        loop = asyncio.get_running_loop()
+        timeout = deadline.cap(CONFIG['REQUEST_TIMEOUT']) if deadline else CONFIG['REQUEST_TIMEOUT']
+        started = time.monotonic()
+        future = loop.run_in_executor(
+            fetch_executor,
+            partial(self.requests_session.get, url, params=params, timeout=timeout)
+        )
+        try:
+            response = await (asyncio.wait_for(future, deadline.remaining()) if deadline else future)
+        except asyncio.TimeoutError:
+            # The abandoned thread still owns the old session; give this bot a fresh one
+            self._create_requests_session()
+            raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted while fetching {url}")
+        except asyncio.CancelledError:
+            self._create_requests_session()
+            raise
+        # Only the fetch itself: slot, rate limiter and retry waits would teach hedging the backoff
+        if self.latency_tracker and response.status_code == 200:
+            self.latency_tracker.record(time.monotonic() - started)
+        return response
+
+    async def _send(self, url: str, params: Dict = None, deadline: Optional[Deadline] = None):
+        """Fetch within the shared concurrency limit and rate limits, reporting the outcome"""
+        if self.concurrency:
+            if deadline:
+                try:
+                    await asyncio.wait_for(self.concurrency.acquire(), deadline.remaining())
+                except asyncio.TimeoutError:
+                    raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted waiting for a request slot")
+            else:
+                await self.concurrency.acquire()
+        try:
+            if self.rate_limiter:
+                if deadline and self.rate_limiter.wait_time(self.bot_id) >= deadline.remaining():
+                    raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted waiting for the rate limiter")
+                await self.rate_limiter.acquire(self.bot_id)
+            response = await self._fetch(url, params=params, deadline=deadline)
+        finally:
+            if self.concurrency:
+                self.concurrency.release()
+
+        if self.concurrency:
+            if response.status_code in (429, 403):
+                self.concurrency.on_throttle()
+            elif response.status_code == 200:
+                self.concurrency.on_success()
+        return response
+
+    async def _retry_delay(self, attempt: int, deadline: Optional[Deadline] = None):
+        delay = CONFIG['RETRY_DELAY'] * (attempt + 1)
+        if deadline and delay >= deadline.remaining():
+            raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted before retry {attempt + 2}")
+        await asyncio.sleep(delay)
+
+    async def make_request(self, url: str, params: Dict = None, deadline: Optional[Deadline] = None) -> Optional[str]:
         if not self.session:
             await self.create_session()
         
-        current_time = time.time()
-        if current_time - self.last_request_time < CONFIG['REQUEST_DELAY_RANGE'][0]:
-            delay = random.uniform(*CONFIG['REQUEST_DELAY_RANGE'])
-            await asyncio.sleep(delay)
-        
         try:
-            self.is_busy = True
-            
             # Always make direct requests using cloudscraper
             for attempt in range(CONFIG['MAX_RETRIES']):
                 try:
-                    response = self.requests_session.get(
-                        url, 
-                        params=params, 
-                        timeout=30
-                    )
+                    if deadline:
+                        deadline.check(f"attempt {attempt + 1}")
+                    response = await self._send(url, params=params, deadline=deadline)
                     if response.status_code == 200:
                         self.requests_made += 1
                         self.last_request_time = time.time()
@@ -160,33 +329,60 @@ class Bot:
                         return response.text
                     elif response.status_code == 429:
                         logger.warning(f"Bot {self.bot_id}: Rate limited, attempt {attempt + 1}/{CONFIG['MAX_RETRIES']}")
-                        await asyncio.sleep(CONFIG['RETRY_DELAY'] * (attempt + 1))
+                        await self._retry_delay(attempt, deadline)
                         continue
                     elif response.status_code == 403:
                         logger.warning(f"Bot {self.bot_id}: Cloudflare block detected, attempt {attempt + 1}/{CONFIG['MAX_RETRIES']}")
                         self._create_requests_session()  # Recreate cloudscraper session
-                        await asyncio.sleep(CONFIG['RETRY_DELAY'] * (attempt + 1))
+                        await self._retry_delay(attempt, deadline)
                         continue
                     else:
                         logger.error(f"Bot {self.bot_id}: HTTP {response.status_code}")
                         break
+                except DeadlineExceeded:
+                    raise
                 except Exception as e:
                     logger.error(f"Bot {self.bot_id}: Request failed - {str(e)}")
                     if attempt < CONFIG['MAX_RETRIES'] - 1:
-                        await asyncio.sleep(CONFIG['RETRY_DELAY'] * (attempt + 1))
+                        await self._retry_delay(attempt, deadline)
                         continue
                     break
             self.retry_count += 1
             return None
+        except DeadlineExceeded:
+            self.retry_count += 1
+            raise
         except Exception as e:
             logger.error(f"Bot {self.bot_id}: Request failed - {str(e)}")
             return None
-        finally:
-            self.is_busy = False
+
+class BotPoolBusy(Exception):
+    """Raised when no bot lease can be granted in time or the wait queue is full"""
 
 class BotManager:
+    """Pool of bots handed out as exclusive leases.
+
+    Idle bots sit in a deque; callers that find none wait on a future in a
+    bounded FIFO queue and are handed the next released bot directly, so a
+    bot can never be given to two callers at once.
+    """
+
     def __init__(self):
         self.bots: List[Bot] = []
+        self._idle: deque = deque()
+        self._waiters: deque = deque()
+        self.rate_limiter = RateLimiter(
+            CONFIG['GLOBAL_RATE_LIMIT'], CONFIG['GLOBAL_RATE_BURST'],
+            CONFIG['BOT_RATE_LIMIT'], CONFIG['BOT_RATE_BURST']
+        )
+        self.concurrency = AdaptiveConcurrencyController(
+            self.rate_limiter,
+            max_limit=CONFIG['MAX_CONCURRENT_BOTS'],
+            decrease_factor=CONFIG['AIMD_DECREASE_FACTOR'],
+            cooldown=CONFIG['AIMD_COOLDOWN']
+        )
+        # Fetch latencies of every bot, which hedging learns its threshold from
+        self.latency_tracker = LatencyTracker()
         self.setup_bots()
     
     def setup_bots(self):
@@ -198,16 +394,73 @@ class BotManager:
             else:
                 proxy_endpoint = None
                 
-            bot = Bot(i)
+            bot = Bot(i, self.rate_limiter, self.concurrency, self.latency_tracker)
             self.bots.append(bot)
+            self._idle.append(bot)
         
         logger.info(f"Initialized {len(self.bots)} bots with {len(proxy_endpoints)} proxies")
     
+    @property
+    def waiting(self) -> int:
+        return len(self._waiters)
+
     async def get_available_bot(self) -> Optional[Bot]:
+        """Return an idle bot without leasing it (used by the standalone test scripts)"""
         for bot in self.bots:
             if not bot.is_busy:
                 return bot
         return None
+
+    def try_acquire_bot(self) -> Optional[Bot]:
+        """Lease an idle bot without waiting, or return None; never jumps the wait queue"""
+        if self._idle and not self._waiters:
+            bot = self._idle.popleft()
+            bot.is_busy = True
+            return bot
+        return None
+
+    async def acquire_bot(self, timeout: Optional[float] = None) -> Bot:
+        """Lease a bot, waiting in FIFO order for up to `timeout` seconds"""
+        bot = self.try_acquire_bot()
+        if bot:
+            return bot
+
+        if len(self._waiters) >= CONFIG['BOT_WAIT_QUEUE_SIZE']:
+            raise BotPoolBusy("No available bots: wait queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            return await asyncio.wait_for(waiter, timeout)
+        except asyncio.TimeoutError:
+            raise BotPoolBusy(f"No available bots after waiting {timeout}s")
+        except asyncio.CancelledError:
+            # Handed a bot in the same tick we were cancelled: pass it on
+            if waiter.done() and not waiter.cancelled():
+                self.release_bot(waiter.result())
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release_bot(self, bot: Bot):
+        """Return a leased bot, handing it straight to the oldest live waiter"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(bot)
+                return
+        bot.is_busy = False
+        self._idle.append(bot)
+
+    @asynccontextmanager
+    async def lease(self, timeout: Optional[float] = None):
+        """Async context manager that leases a bot and always releases it"""
+        bot = await self.acquire_bot(timeout)
+        try:
+            yield bot
+        finally:
+            self.release_bot(bot)
     
     async def shutdown(self):
         for bot in self.bots:
@@ -217,6 +470,31 @@ class EtsyScraper:
     def __init__(self, bot_manager: BotManager, redis_client):
         self.bot_manager = bot_manager
         self.redis_client = redis_client
+        self.single_flight = SingleFlight(
+            redis_client,
+            marker_ttl=CONFIG['INFLIGHT_MARKER_TTL'],
+            wait_timeout=CONFIG['INFLIGHT_MARKER_TTL']
+        )
+        self.latency_tracker = bot_manager.latency_tracker
+        self.parser_backend = CONFIG['PARSER_BACKEND']
+        self.hedge_budget = HedgeBudget(CONFIG['HEDGE_BUDGET_RATIO'])
+        self.result_cache = TieredCache(
+            LocalCache(CONFIG['L1_CACHE_SIZE'], min(CONFIG['L1_CACHE_TTL'], CONFIG['CACHE_EXPIRY'])),
+            CONFIG['CACHE_EXPIRY'],
+            encode=lambda products: cache_codec.encode([product.__dict__ for product in products]),
+            decode=lambda cached: [EtsyProduct(**item) for item in CacheCodec.decode(cached)],
+            channel=CONFIG['CACHE_INVALIDATION_CHANNEL'] or None
+        )
+        self.result_cache.redis_client = redis_client
+        # Stale searches with a background refresh queued or running
+        self.refreshing = set()
+        self.refresh_stats = {'stale_served': 0, 'refreshes': 0, 'refresh_errors': 0}
+
+    def use_redis(self, redis_client):
+        """Cache and coordinate searches through this (async) Redis client"""
+        self.redis_client = redis_client
+        self.single_flight.redis_client = redis_client
+        self.result_cache.redis_client = redis_client
     
     def build_etsy_search_url(self, keyword: str, product_type: str, filter_type: str) -> str:
         base_url = "https://www.etsy.com/search"
@@ -231,249 +509,193 @@ class EtsyScraper:
         return f"{base_url}?{urlencode(params)}"
     
     def extract_product_data(self, html: str, search_keyword: str) -> List[EtsyProduct]:
-        soup = BeautifulSoup(html, 'html.parser')
-        products = []
-        
-        # Multiple selectors to handle Etsy's changing structure
-        selectors = [
-            'div[data-test-id="organic-search-result"]',
-            'div[class*="listing-card"]',
-            'div[class*="search-result"]',
-            '.organic-search-result'
-        ]
-        
-        product_containers = []
-        for selector in selectors:
-            containers = soup.select(selector)
-            if containers:
-                product_containers = containers
-                break
-        
-        logger.info(f"Found {len(product_containers)} product containers")
+        return [EtsyProduct(**record) for record in extract_products(
+            html, search_keyword, self.parser_backend, CONFIG['SCOPED_PARSE'], CONFIG['STRUCTURED_DATA']
+        )]
+
+    async def parse_products(self, html: str, search_keyword: str,
+                             deadline: Optional[Deadline] = None) -> List[EtsyProduct]:
+        """Extract products in the parse pool so a large page does not stall the event loop.
+
+        A page identical to one parsed recently is answered from the parse cache.
+        """
+        params = (search_keyword, self.parser_backend, CONFIG['SCOPED_PARSE'], CONFIG['STRUCTURED_DATA'])
+        cache_key = parse_cache.key(html, 'products', *params) if parse_cache.enabled else None
+        records = parse_cache.get(cache_key) if cache_key else None
+        if records is None:
+            try:
+                records = await parse_pool.run(
+                    extract_products, html, *params,
+                    timeout=deadline.remaining() if deadline else None
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted during parsing")
+            except ParsePoolBusy as e:
+                raise HTTPException(status_code=503, detail=str(e))
+            if cache_key:
+                parse_cache.put(cache_key, records)
+        return [EtsyProduct(**record) for record in records]
+    
+    async def _leased_fetch(self, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        acquire_timeout = deadline.cap(CONFIG['BOT_ACQUIRE_TIMEOUT']) if deadline else CONFIG['BOT_ACQUIRE_TIMEOUT']
+        try:
+            async with self.bot_manager.lease(acquire_timeout) as bot:
+                logger.info(f"Bot {bot.bot_id} fetching: {url}")
+                return await bot.make_request(url, deadline=deadline)
+        except BotPoolBusy as e:
+            if deadline:
+                deadline.check("bot lease")
+            raise HTTPException(status_code=503, detail=str(e))
+
+    async def _hedge_fetch(self, bot: Bot, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        try:
+            logger.info(f"Bot {bot.bot_id} hedging: {url}")
+            return await bot.make_request(url, deadline=deadline)
+        finally:
+            self.bot_manager.release_bot(bot)
+
+    async def fetch_page(self, url: str, deadline: Optional[Deadline] = None) -> Optional[str]:
+        """Fetch a page through a leased bot.
+
+        With HEDGE_ENABLED, a fetch still unanswered after the learned
+        HEDGE_PERCENTILE latency is raced against the same fetch on a second
+        idle bot, within the hedge budget. The first page wins and the other
+        request is cancelled.
+        """
+        if not CONFIG['HEDGE_ENABLED']:
+            return await self._leased_fetch(url, deadline)
+
+        self.hedge_budget.earn()
+        tasks = [asyncio.ensure_future(self._leased_fetch(url, deadline))]
+        try:
+            hedge_after = self.latency_tracker.percentile(CONFIG['HEDGE_PERCENTILE'])
+            if hedge_after is None:
+                return await tasks[0]
+            done, _ = await asyncio.wait(tasks, timeout=hedge_after)
+            if done:
+                return tasks[0].result()
+
+            bot = self.bot_manager.try_acquire_bot()
+            if not bot:
+                return await tasks[0]
+            if not self.hedge_budget.try_spend():
+                self.bot_manager.release_bot(bot)
+                return await tasks[0]
+            tasks.append(asyncio.ensure_future(self._hedge_fetch(bot, url, deadline)))
+
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if not task.exception() and task.result():
+                        if task is tasks[1]:
+                            self.hedge_budget.hedge_wins += 1
+                        return task.result()
+            # Neither request produced a page: surface the primary's outcome
+            return tasks[0].result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def get_cached_products(self, cache_key: str) -> Optional[List[EtsyProduct]]:
+        cached_products = await self.result_cache.get(cache_key)
+        # A copy, so callers never reorder the list held in the local cache
+        return list(cached_products) if cached_products else None
+
+    async def search_products(self, request: SearchRequest, deadline: Optional[Deadline] = None,
+                              background_tasks: Optional[BackgroundTasks] = None) -> List[EtsyProduct]:
+        # Spelling variants of a search share one scrape and one cache entry, which
+        # holds every product of the page: any max_results is served from it
+        request = self.normalize_request(request)
+        cache_key = "etsy_search:" + ":".join(
+            quote_plus(part) for part in (request.keyword, request.product_type, request.filter_type)
+        )
         
-        for container in product_containers[:20]:
+        # Check cache; past the soft TTL the cached results are still served
+        cached = await self.result_cache.get_entry(cache_key)
+        if cached:
+            cached_products, age = cached
+            if age >= CONFIG['CACHE_SOFT_TTL'] and background_tasks is not None:
+                self.refresh_stats['stale_served'] += 1
+                self.schedule_refresh(request, cache_key, background_tasks)
+            return list(cached_products)[:request.max_results]
+
+        # Identical searches already in flight (here or in another worker) share one scrape.
+        # The shared scrape runs on the budget of the request that started it; every
+        # caller stops waiting when its own budget runs out. A caller left with budget
+        # when someone else's scrape runs out of time starts a new one on its own budget.
+        while True:
+            led = []
             try:
-                product = self.parse_product_container(container, search_keyword)
-                if product:
-                    products.append(product)
-            except Exception as e:
-                logger.error(f"Error parsing product: {str(e)}")
+                products = await self.single_flight.do(
+                    cache_key,
+                    lambda: led.append(True) or self.scrape_products(request, cache_key, deadline),
+                    load_result=lambda: self.get_cached_products(cache_key),
+                    timeout=deadline.remaining() if deadline else None
+                )
+            except asyncio.TimeoutError:
+                raise DeadlineExceeded(f"Time budget of {deadline.timeout}s exhausted waiting for search results")
+            except DeadlineExceeded:
+                if led or (deadline and deadline.expired):
+                    raise
+                logger.info(f"Shared scrape of {cache_key} ran out of its budget, retrying on this request's")
                 continue
-        
-        return products
-    
-    def parse_product_container(self, container, search_keyword: str) -> Optional[EtsyProduct]:
+            return products[:request.max_results]
+
+    @staticmethod
+    def normalize_request(request: SearchRequest) -> SearchRequest:
+        sort_tokens = CONFIG['SORT_QUERY_TOKENS']
+        return request.model_copy(update={
+            'keyword': normalize_query(request.keyword, sort_tokens),
+            'product_type': normalize_query(request.product_type, sort_tokens),
+            'filter_type': normalize_query(request.filter_type)
+        })
+
+    def schedule_refresh(self, request: SearchRequest, cache_key: str, background_tasks: BackgroundTasks):
+        """Re-scrape a stale search once the response is sent, at most once at a time per key"""
+        if cache_key in self.refreshing:
+            return
+        self.refreshing.add(cache_key)
+        background_tasks.add_task(self.refresh_products, request, cache_key)
+
+    async def refresh_products(self, request: SearchRequest, cache_key: str):
         try:
-            # Title - updated selectors for Etsy's current structure
-            title_selectors = [
-                'h3.v2-listing-card__title',
-                'h3[data-test-id="listing-link"]',
-                'a[data-test-id="listing-link"] h3',
-                '.v2-listing-card__title',
-                'h3'
-            ]
-            title = "Unknown Title"
-            
-            for selector in title_selectors:
-                title_elem = container.select_one(selector)
-                if title_elem:
-                    title = title_elem.get_text(strip=True)
-                    break
-            
-            # Price - updated selectors
-            price_selectors = [
-                '.currency-value',
-                '.wt-text-title-01 .currency-value',
-                '.wt-text-title-01 .currency-symbol',
-                '.wt-text-title-01 .currency-value + .currency-symbol',
-                '.price'
-            ]
-            price = "$0.00"
-            
-            for selector in price_selectors:
-                price_elem = container.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text(strip=True)
-                    if '$' in price_text or '€' in price_text or '£' in price_text:
-                        price = price_text
-                        break
-            
-            # Shop name - updated selectors
-            shop_selectors = [
-                'p.wt-text-caption',
-                '.wt-text-caption a[href*="/shop/"]',
-                '.shop-name',
-                'a[href*="/shop/"]'
-            ]
-            shop_name = "Unknown Shop"
-            
-            for selector in shop_selectors:
-                shop_elem = container.select_one(selector)
-                if shop_elem:
-                    shop_name = shop_elem.get_text(strip=True)
-                    break
-            
-            # URL - updated selectors
-            url_selectors = [
-                'a[data-test-id="listing-link"]',
-                '.v2-listing-card__title a',
-                'a[href*="/listing/"]',
-                '.listing-link'
-            ]
-            url = ""
-            
-            for selector in url_selectors:
-                link_elem = container.select_one(selector)
-                if link_elem and link_elem.get('href'):
-                    url = link_elem['href']
-                    if url and not url.startswith('http'):
-                        url = f"https://www.etsy.com{url}"
-                    break
-            
-            # Image - updated selectors
-            img_selectors = [
-                'img.v2-listing-card__img',
-                'img[data-test-id="listing-card-image"]',
-                '.v2-listing-card__img',
-                'img'
-            ]
-            image_url = ""
-            for selector in img_selectors:
-                img_elem = container.select_one(selector)
-                if img_elem and img_elem.get('src'):
-                    image_url = img_elem['src']
-                    break
-            
-            # Sales count - updated selectors
-            sales_selectors = [
-                '.wt-text-caption .wt-text-gray',
-                '.wt-text-caption .wt-text-gray-light',
-                '.wt-text-caption'
-            ]
-            sales_count = 0
-            for selector in sales_selectors:
-                sales_elem = container.select_one(selector)
-                if sales_elem:
-                    sales_text = sales_elem.get_text(strip=True)
-                    if 'sale' in sales_text.lower() or 'sold' in sales_text.lower():
-                        sales_count = self.estimate_sales_count(sales_text)
-                        break
-            
-            # Star seller and best seller badges - updated selectors
-            badge_selectors = [
-                '.wt-badge',
-                '.wt-text-caption .wt-badge',
-                '.wt-text-caption .wt-text-gray'
-            ]
-            is_star_seller = False
-            is_best_seller = False
-            for selector in badge_selectors:
-                badge_elem = container.select_one(selector)
-                if badge_elem:
-                    badge_text = badge_elem.get_text(strip=True).lower()
-                    if 'star seller' in badge_text:
-                        is_star_seller = True
-                    if 'best seller' in badge_text:
-                        is_best_seller = True
-            
-            # Mock additional data (in real scraping, these would be extracted)
-            views_estimate = random.randint(500, 5000)
-            listing_age_days = random.randint(30, 365)
-            shop_rating = round(random.uniform(4.0, 5.0), 1)
-            
-            keywords = self.extract_keywords(title, search_keyword)
-            
-            return EtsyProduct(
-                title=title,
-                price=price,
-                shop_name=shop_name,
-                url=url,
-                image_url=image_url,
-                sales_count=sales_count,
-                views_estimate=views_estimate,
-                listing_age_days=listing_age_days,
-                is_star_seller=is_star_seller,
-                is_best_seller=is_best_seller,
-                keywords=keywords,
-                shop_rating=shop_rating
+            # Coalesced with any scrape of the same search here or in another worker;
+            # while another worker holds it, the stale results are good enough
+            await self.single_flight.do(
+                cache_key,
+                lambda: self.scrape_products(request, cache_key, Deadline(CONFIG['SEARCH_TIMEOUT'])),
+                load_result=lambda: self.get_cached_products(cache_key)
             )
-            
+            self.refresh_stats['refreshes'] += 1
+            logger.info(f"Background refresh of {cache_key} done")
         except Exception as e:
-            logger.error(f"Error parsing product: {str(e)}")
-            return None
-    
-    def estimate_sales_count(self, container) -> int:
-        # Look for review indicators
-        review_patterns = [r'(\d+)\s*review', r'(\d+)\s*sale', r'sold\s*(\d+)', r'(\d+)\s*favorite']
-        
-        container_text = str(container).lower()
-        for pattern in review_patterns:
-            match = re.search(pattern, container_text)
-            if match:
-                count = int(match.group(1))
-                return random.randint(count * 2, count * 5)
-        
-        return random.randint(10, 500)
-    
-    def extract_keywords(self, title: str, search_keyword: str) -> List[str]:
-        keywords = [search_keyword.lower()]
-        
-        common_keywords = [
-            'gift', 'custom', 'personalized', 'handmade', 'vintage', 
-            'unique', 'funny', 'cute', 'cool', 'trendy', 'modern'
-        ]
-        
-        title_lower = title.lower()
-        for keyword in common_keywords:
-            if keyword in title_lower and keyword not in keywords:
-                keywords.append(keyword)
-        
-        title_words = re.findall(r'\b[a-zA-Z]{3,}\b', title_lower)
-        for word in title_words[:3]:
-            if word not in keywords and len(word) > 3:
-                keywords.append(word)
-        
-        return keywords[:6]
-    
-    async def search_products(self, request: SearchRequest) -> List[EtsyProduct]:
-        cache_key = f"etsy_search:{request.keyword}:{request.product_type}:{request.filter_type}"
-        
-        # Check cache
-        if self.redis_client:
-            try:
-                cached_result = self.redis_client.get(cache_key)
-                if cached_result:
-                    logger.info(f"Cache hit for {cache_key}")
-                    cached_data = json.loads(cached_result)
-                    return [EtsyProduct(**item) for item in cached_data]
-            except Exception as e:
-                logger.error(f"Cache error: {str(e)}")
-        
-        # Get bot
-        bot = await self.bot_manager.get_available_bot()
-        if not bot:
-            raise HTTPException(status_code=503, detail="No available bots")
-        
-        # Search
+            self.refresh_stats['refresh_errors'] += 1
+            logger.warning(f"Background refresh of {cache_key} failed: {str(e)}")
+        finally:
+            self.refreshing.discard(cache_key)
+
+    async def scrape_products(self, request: SearchRequest, cache_key: str,
+                              deadline: Optional[Deadline] = None) -> List[EtsyProduct]:
         search_url = self.build_etsy_search_url(request.keyword, request.product_type, request.filter_type)
-        logger.info(f"Bot {bot.bot_id} searching: {search_url}")
-        
-        html_content = await bot.make_request(search_url)
+        html_content = await self.fetch_page(search_url, deadline)
         if not html_content:
             raise HTTPException(status_code=500, detail="Failed to fetch search results")
         
-        products = self.extract_product_data(html_content, request.keyword)
+        products = await self.parse_products(html_content, request.keyword, deadline)
         products.sort(key=lambda p: p.sales_count, reverse=True)
+        # Every listing repeats the searched term itself, so it is left out of the counts
+        keyword_frequencies.record(Counter(
+            keyword for product in products for keyword in product.keywords if keyword != request.keyword
+        ))
+        heavy_hitters.update(token for product in products for token in title_tokens(product.title))
         
         # Cache results
-        if self.redis_client and products:
-            try:
-                cache_data = [product.__dict__ for product in products]
-                self.redis_client.setex(cache_key, CONFIG['CACHE_EXPIRY'], json.dumps(cache_data, default=str))
-            except Exception as e:
-                logger.error(f"Cache save error: {str(e)}")
+        if products:
+            await self.result_cache.set(cache_key, list(products))
         
-        return products[:request.max_results]
+        return products
 
 class EtsyResearchApp:
     def __init__(self):
@@ -486,21 +708,63 @@ class EtsyResearchApp:
 
 # App setup
 bot_manager = BotManager()
-redis_client = None
 
-try:
-    redis_client = redis.from_url(CONFIG['REDIS_URL'], decode_responses=True)
-    redis_client.ping()
-    logger.info("Redis connected successfully")
-except Exception as e:
-    logger.warning(f"Redis connection failed: {str(e)}. Running without cache.")
-    redis_client = None
+# No I/O here: connections are opened on the event loop, and lifespan checks Redis is up.
+# Once the pool is exhausted, cache calls fail fast and are treated as cache misses.
+redis_pool = aioredis.ConnectionPool.from_url(
+    CONFIG['REDIS_URL'],
+    # Cached results are binary, so replies are left as bytes
+    decode_responses=False,
+    max_connections=CONFIG['REDIS_MAX_CONNECTIONS'],
+    socket_timeout=CONFIG['REDIS_SOCKET_TIMEOUT'],
+    socket_connect_timeout=CONFIG['REDIS_CONNECT_TIMEOUT']
+)
+redis_client = aioredis.Redis(connection_pool=redis_pool)
+
+async def connect_redis():
+    try:
+        await redis_client.ping()
+        scraper.use_redis(redis_client)
+        trending_service.redis_client = redis_client
+        heavy_hitters.redis_client = redis_client
+        logger.info("Redis connected successfully")
+    except Exception as e:
+        logger.warning(f"Redis connection failed: {str(e)}. Running without cache.")
+
+async def save_selector_stats_periodically():
+    while True:
+        await asyncio.sleep(CONFIG['SELECTOR_STATS_SAVE_INTERVAL'])
+        selector_registry.save(CONFIG['SELECTOR_STATS_FILE'])
+
+async def flush_heavy_hitters_periodically():
+    while True:
+        await asyncio.sleep(CONFIG['HEAVY_HITTER_FLUSH_INTERVAL'])
+        await heavy_hitters.flush()
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Starting Etsy Scraper API")
+    selector_registry.load(CONFIG['SELECTOR_STATS_FILE'])
+    await connect_redis()
+    await parse_pool.start()
+    stats_saver = asyncio.ensure_future(save_selector_stats_periodically())
+    invalidation_listener = None
+    if scraper.redis_client and scraper.result_cache.channel:
+        invalidation_listener = asyncio.ensure_future(scraper.result_cache.listen_for_invalidations())
+    trending_refresher = asyncio.ensure_future(trending_service.refresh_periodically())
+    heavy_hitters_flusher = asyncio.ensure_future(flush_heavy_hitters_periodically())
     yield
+    stats_saver.cancel()
+    trending_refresher.cancel()
+    heavy_hitters_flusher.cancel()
+    await heavy_hitters.flush()
+    if invalidation_listener:
+        invalidation_listener.cancel()
+    selector_registry.save(CONFIG['SELECTOR_STATS_FILE'])
     await bot_manager.shutdown()
+    fetch_executor.shutdown(wait=False, cancel_futures=True)
+    parse_pool.shutdown()
+    await redis_pool.disconnect()
     logger.info("Shutdown complete")
 
 app = FastAPI(
@@ -522,9 +786,29 @@ app.add_middleware(
 if os.path.exists("static"):
     app.mount("/static", StaticFiles(directory="static"), name="static")
 
-scraper = EtsyScraper(bot_manager, redis_client)
+scraper = EtsyScraper(bot_manager, None)
 app.scraper = scraper
 
+async def fetch_trending_page(url: str) -> Optional[str]:
+    bot = await bot_manager.acquire_bot(CONFIG['BOT_ACQUIRE_TIMEOUT'])
+    try:
+        return await bot.make_request(url, deadline=Deadline(CONFIG['SEARCH_TIMEOUT']))
+    finally:
+        bot_manager.release_bot(bot)
+
+trending_manager = TrendingKeywordsManager(
+    parser_backend=CONFIG['PARSER_BACKEND'], parse_pool=parse_pool, parse_cache=parse_cache,
+    frequency_store=keyword_frequencies, heavy_hitters=heavy_hitters
+)
+# /api/trending only reads this snapshot; bots are used by its background refresh alone
+trending_service = TrendingService(
+    lambda: trending_manager.harvest(fetch_trending_page, CONFIG['TRENDING_SOURCES']),
+    DEFAULT_TRENDING_KEYWORDS,
+    interval=CONFIG['TRENDING_REFRESH_INTERVAL'],
+    retry_delay=CONFIG['TRENDING_RETRY_DELAY'],
+    single_flight=scraper.single_flight
+)
+
 @app.get("/")
 async def serve_frontend():
     """Serve the HTML frontend"""
@@ -540,80 +824,106 @@ async def health_check():
         "bots_status": {
             "total": len(bot_manager.bots),
             "available": len([b for b in bot_manager.bots if not b.is_busy]),
-            "busy": len([b for b in bot_manager.bots if b.is_busy])
+            "busy": len([b for b in bot_manager.bots if b.is_busy]),
+            "waiting": bot_manager.waiting
+        },
+        "rate_limiter": bot_manager.rate_limiter.status(),
+        "concurrency": bot_manager.concurrency.status(),
+        "hedging": {
+            "enabled": CONFIG['HEDGE_ENABLED'],
+            "hedge_after_seconds": scraper.latency_tracker.percentile(CONFIG['HEDGE_PERCENTILE']),
+            **scraper.hedge_budget.status()
+        },
+        "parse_pool": parse_pool.status(),
+        "parse_cache": parse_cache.status(),
+        "redis_connected": scraper.redis_client is not None,
+        "trending": trending_service.status(),
+        "keyword_frequencies": keyword_frequencies.status(),
+        "heavy_hitters": heavy_hitters.status(),
+        "cache": {
+            **scraper.result_cache.status(),
+            "soft_ttl": CONFIG['CACHE_SOFT_TTL'],
+            "hard_ttl": CONFIG['CACHE_EXPIRY'],
+            "refreshing": len(scraper.refreshing),
+            **scraper.refresh_stats
         },
-        "redis_connected": redis_client is not None,
         "proxy_endpoints": len([ep for ep in CONFIG['PROXY_ENDPOINTS'] if ep.strip()])
     }
 
+@app.get("/api/selectors")
+async def selector_statistics():
+    """Hit/miss counts and current order of every selector fallback chain"""
+    return {
+        "adaptive": selector_registry.adaptive,
+        "chains": selector_registry.status()
+    }
+
+class ClientDisconnected(Exception):
+    """Raised when the HTTP client went away before its result was ready"""
+
+async def run_until_disconnected(http_request: Request, coro):
+    """Await `coro`, cancelling it as soon as the HTTP client disconnects.
+
+    Cancellation releases any leased bot straight away; a coalesced scrape
+    keeps running while another caller still waits on it.
+    """
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=CONFIG['DISCONNECT_POLL_INTERVAL'])
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                raise ClientDisconnected(f"Client disconnected from {http_request.url.path}")
+    finally:
+        if not task.done():
+            task.cancel()
+
 @app.post("/api/search")
-async def search_products(request: SearchRequest):
+async def search_products(request: SearchRequest, http_request: Request, background_tasks: BackgroundTasks,
+                          x_request_timeout: Optional[float] = Header(None, gt=0)):
+    budget = request.timeout if request.timeout is not None else x_request_timeout
+    if budget is None:
+        budget = CONFIG['SEARCH_TIMEOUT']
+    deadline = Deadline(min(budget, CONFIG['MAX_SEARCH_TIMEOUT']))
     try:
-        products = await scraper.search_products(request)
+        products = await run_until_disconnected(http_request, scraper.search_products(request, deadline, background_tasks))
         return [product.__dict__ for product in products]  # Convert to dict for JSON response
+    except HTTPException:
+        raise
+    except ClientDisconnected as e:
+        logger.info(f"{str(e)}, search cancelled")
+        return Response(status_code=499)
+    except DeadlineExceeded as e:
+        logger.warning(f"Search timed out: {str(e)}")
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Search error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/trending")
 async def get_trending_keywords():
-    """Get trending keywords"""
-    try:
-        # Get a bot to fetch trending data
-        bot = await bot_manager.get_available_bot()
-        if not bot:
-            # Return default keywords if no bot available
-            default_keywords = [
-                "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
-                "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
-                "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
-                "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
-            ]
-            return {
-                "trending": default_keywords,
-                "updated": datetime.now().isoformat()
-            }
+    """Get trending keywords from the background-refreshed snapshot"""
+    return trending_service.current()
 
-        # Try to get trending keywords from Etsy
-        try:
-            html_content = await bot.make_request('https://www.etsy.com/trending')
-            if html_content:
-                trending_manager = TrendingKeywordsManager()
-                trending_keywords = await trending_manager.extract_trending_from_listings(html_content)
-            else:
-                # Fallback to default keywords
-                trending_keywords = [
-                    "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
-                    "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
-                    "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
-                    "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
-                ]
-        except Exception as e:
-            logger.error(f"Error fetching trending keywords: {str(e)}")
-            # Return default keywords on error
-            trending_keywords = [
-                "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
-                "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
-                "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
-                "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
-            ]
-
-        return {
-            "trending": trending_keywords,
-            "updated": datetime.now().isoformat()
-        }
-    except Exception as e:
-        logger.error(f"Trending keywords error: {str(e)}")
-        # Return default keywords as fallback
-        return {
-            "trending": [
-                "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
-                "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
-                "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
-                "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
-            ],
-            "updated": datetime.now().isoformat()
-        }
+@app.get("/api/trending/frequencies")
+async def get_keyword_frequencies(window: str = "24h", limit: int = 20):
+    """Most frequent keywords on pages scraped within a sliding window"""
+    if window not in keyword_frequencies.windows:
+        raise HTTPException(status_code=400, detail=f"Unknown window '{window}', expected one of {list(keyword_frequencies.windows)}")
+    return {
+        "window": window,
+        "keywords": keyword_frequencies.top(window, max(1, min(limit, 100)))
+    }
+
+@app.get("/api/trending/heavy-hitters")
+async def get_heavy_hitters(limit: int = 20):
+    """Most frequent title tokens across every page scraped by any worker, with the error bound"""
+    return {
+        "total": heavy_hitters.sketch.total,
+        "error_bound": round(heavy_hitters.error_bound(), 1),
+        "keywords": heavy_hitters.top_k(max(1, min(limit, heavy_hitters.k)))
+    }
 
 if __name__ == "__main__":
     import uvicorn
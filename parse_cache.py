@@ -0,0 +1,64 @@
+"""
+Parse results cached by the content hash of the page they came from
+"""
+
+import hashlib
+import pickle
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+class ParseCache:
+    """LRU cache of parse results, bounded by their total size in bytes.
+
+    Keys combine a SHA-256 digest of the page with the parse parameters, so
+    a byte-identical page is never parsed twice while it stays cached.
+    Sizes are the pickled size of each result, i.e. what a parse worker
+    sends back for it. A `max_bytes` of 0 disables the cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self._entries: "OrderedDict[Tuple, Tuple[Any, int]]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    @staticmethod
+    def key(html: str, *params: Hashable) -> Tuple:
+        # SHA-256 is hardware accelerated on current CPUs: faster here than MD5 or BLAKE2
+        digest = hashlib.sha256(html.encode('utf-8', 'surrogatepass')).digest()
+        return (digest,) + params
+
+    def get(self, key: Tuple) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def put(self, key: Tuple, value: Any):
+        size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous[1]
+        self._entries[key] = (value, size)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.stats['evictions'] += 1
+
+    def status(self) -> Dict:
+        return {
+            'entries': len(self._entries),
+            'bytes': self.bytes,
+            'max_bytes': self.max_bytes,
+            **self.stats
+        }
@@ -0,0 +1,140 @@
+"""
+Process pool that keeps HTML parsing off the event loop
+"""
+
+import asyncio
+import logging
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional
+
+from product_parsing import extract_products
+from selector_stats import selector_registry, call_with_selector_stats
+from trending_keywords import extract_trending_keywords
+
+logger = logging.getLogger(__name__)
+
+# One listing card and a few links: enough to import the parser, compile the
+# selectors and fill their caches in a fresh worker
+WARM_UP_HTML = """<html><head><meta name="keywords" content="warm up"></head><body>
+<div data-test-id="organic-search-result"><a data-test-id="listing-link" href="/listing/1/warm-up">
+<img class="v2-listing-card__img" src="warm-up.jpg"><h3 class="v2-listing-card__title">Warm up listing</h3>
+<p class="wt-text-caption">Shop</p><span class="wt-text-caption wt-text-gray">(1 review)</span>
+<div class="wt-text-title-01"><span class="currency-symbol">$</span><span class="currency-value">1.00</span></div>
+<span class="wt-badge">Star Seller</span></a></div>
+<a href="/search?q=warm+up">Warm up</a><a href="/c/warm-up">Warm up</a><span class="badge">Warm up</span>
+</body></html>"""
+
+class ParsePoolBusy(Exception):
+    """Raised when the parse queue is full"""
+
+def _warm_up(backend: str):
+    # Forked workers start with the parent's random state; the mocked product
+    # fields would repeat across workers without a reseed
+    random.seed()
+    # Selector order is decided by the parent from every worker's counts
+    selector_registry.adaptive = False
+    logging.disable(logging.WARNING)
+    try:
+        extract_products(WARM_UP_HTML, 'warm up', backend)
+        extract_trending_keywords(WARM_UP_HTML, backend)
+    finally:
+        logging.disable(logging.NOTSET)
+        selector_registry.drain()
+
+def _ready() -> int:
+    return os.getpid()
+
+class ParsePool:
+    """Runs parse functions in worker processes.
+
+    At most `workers + queue_size` parses are accepted at once; beyond that
+    `run` raises ParsePoolBusy instead of letting the backlog grow. With
+    `workers` set to 0, or before `start`, functions run inline.
+    """
+
+    def __init__(self, workers: int, queue_size: int, backend: str = 'html.parser'):
+        self.workers = workers
+        self.max_pending = workers + queue_size
+        self.backend = backend
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.pending = 0
+        self.stats = {'pooled': 0, 'inline': 0, 'rejected': 0, 'restarts': 0}
+
+    def _create_executor(self):
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers, initializer=_warm_up, initargs=(self.backend,)
+        )
+
+    async def start(self):
+        """Start and warm up the workers before the first request needs them"""
+        if self.workers <= 0:
+            logger.info("Parse pool disabled, parsing inline")
+            return
+        self._create_executor()
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*(
+            loop.run_in_executor(self.executor, _ready) for _ in range(self.workers)
+        ))
+        logger.info(f"Parse pool ready with {len(set(pids))} of {self.workers} workers warmed up")
+
+    def shutdown(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    async def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None) -> Any:
+        """Run a module-level function on picklable arguments and return its picklable result.
+
+        Workers parse with the current selector orders and their selector
+        counts are merged back here. `timeout` bounds the wait (raising
+        asyncio.TimeoutError); a parse still queued when it expires is dropped
+        from the queue, one already running keeps its place until it ends.
+        """
+        if self.executor is None:
+            self.stats['inline'] += 1
+            return fn(*args)
+        if self.pending >= self.max_pending:
+            self.stats['rejected'] += 1
+            raise ParsePoolBusy(f"Parse queue full ({self.pending} pages pending)")
+
+        executor = self.executor
+        loop = asyncio.get_running_loop()
+        try:
+            future = executor.submit(call_with_selector_stats, selector_registry.orders, fn, *args)
+            # Counted until the worker is done with it, not until this caller stops waiting
+            self.pending += 1
+            future.add_done_callback(lambda _: self._finished(loop))
+            result, selector_counts = await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM on a huge page): replace the pool, but never
+            # retry the page here, where it would block the event loop or kill again
+            if self.executor is executor:
+                logger.error("Parse pool broken, restarting it")
+                self.stats['restarts'] += 1
+                executor.shutdown(wait=False, cancel_futures=True)
+                self._create_executor()
+            raise ParsePoolBusy("Parse worker died, pool restarted")
+        selector_registry.merge(selector_counts)
+        self.stats['pooled'] += 1
+        return result
+
+    def _finished(self, loop: asyncio.AbstractEventLoop):
+        # Called from the executor's thread
+        try:
+            loop.call_soon_threadsafe(self._release)
+        except RuntimeError:
+            pass  # the loop is already closed
+
+    def _release(self):
+        self.pending -= 1
+
+    def status(self) -> Dict:
+        return {
+            'workers': self.workers if self.executor else 0,
+            'pending': self.pending,
+            'max_pending': self.max_pending,
+            **self.stats
+        }
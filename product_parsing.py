@@ -0,0 +1,506 @@
+"""
+Listing extraction from Etsy search pages
+
+Pure functions of the page HTML, kept free of app state so they can run in
+parse worker processes (see parse_pool.py) as well as inline.
+"""
+
+import json
+import logging
+import random
+import re
+from html import unescape
+from typing import Any, Dict, List, Optional, Tuple
+
+from html_parsing import parse_html, ExtractionPlan
+from selector_stats import selector_registry
+
+logger = logging.getLogger(__name__)
+
+# Cards read from one search page
+MAX_PRODUCTS = 20
+
+ORGANIC_RESULT_MARKER = 'data-test-id="organic-search-result"'
+ORGANIC_RESULT_SELECTOR = f'div[{ORGANIC_RESULT_MARKER}]'
+
+# Listing card containers, tried in order (Etsy's structure keeps changing)
+PRODUCT_CONTAINER_SELECTORS = [
+    ORGANIC_RESULT_SELECTOR,
+    'div[class*="listing-card"]',
+    'div[class*="search-result"]',
+    '.organic-search-result'
+]
+
+# Fallback selector chains for each field of a listing card, in priority order
+# (updated for Etsy's current structure)
+PRODUCT_FIELD_SELECTORS = {
+    'title': [
+        'h3.v2-listing-card__title',
+        'h3[data-test-id="listing-link"]',
+        'a[data-test-id="listing-link"] h3',
+        '.v2-listing-card__title',
+        'h3'
+    ],
+    'price': [
+        '.currency-value',
+        '.wt-text-title-01 .currency-value',
+        '.wt-text-title-01 .currency-symbol',
+        '.wt-text-title-01 .currency-value + .currency-symbol',
+        '.price'
+    ],
+    'shop': [
+        'p.wt-text-caption',
+        '.wt-text-caption a[href*="/shop/"]',
+        '.shop-name',
+        'a[href*="/shop/"]'
+    ],
+    'url': [
+        'a[data-test-id="listing-link"]',
+        '.v2-listing-card__title a',
+        'a[href*="/listing/"]',
+        '.listing-link'
+    ],
+    'image': [
+        'img.v2-listing-card__img',
+        'img[data-test-id="listing-card-image"]',
+        '.v2-listing-card__img',
+        'img'
+    ],
+    'sales': [
+        '.wt-text-caption .wt-text-gray',
+        '.wt-text-caption .wt-text-gray-light',
+        '.wt-text-caption'
+    ],
+    'badges': [
+        '.wt-badge',
+        '.wt-text-caption .wt-badge',
+        '.wt-text-caption .wt-text-gray'
+    ]
+}
+
+# When parse_product_container settles on a selector's first match; fields
+# without a check (badges) read every selector
+PRODUCT_FIELD_ACCEPT = {
+    'title': lambda elem: True,
+    'price': lambda elem: any(symbol in elem.get_text(strip=True) for symbol in ('$', '€', '£')),
+    'shop': lambda elem: True,
+    'url': lambda elem: bool(elem.get('href')),
+    'image': lambda elem: bool(elem.get('src')),
+    'sales': lambda elem: any(word in elem.get_text(strip=True).lower() for word in ('sale', 'sold'))
+}
+
+
+# Catch-alls that match some element of almost any card: kept last whatever their hit rate
+PRODUCT_FIELD_LAST_RESORTS = {
+    'title': ['h3'],
+    'price': ['.price'],
+    'shop': ['a[href*="/shop/"]'],
+    'url': ['a[href*="/listing/"]', '.listing-link'],
+    'image': ['img'],
+    'sales': ['.wt-text-caption']
+}
+
+CONTAINER_PLAN = ExtractionPlan(PRODUCT_FIELD_SELECTORS, PRODUCT_FIELD_ACCEPT)
+
+# Chains reordered by observed hit rate; badges are read exhaustively, so their order never matters
+ADAPTIVE_FIELDS = ('title', 'price', 'shop', 'url', 'image', 'sales')
+for _field in ADAPTIVE_FIELDS:
+    selector_registry.register(f'product.{_field}', PRODUCT_FIELD_SELECTORS[_field], PRODUCT_FIELD_LAST_RESORTS[_field])
+
+def apply_selector_order(plan: ExtractionPlan = CONTAINER_PLAN):
+    """Bring the plan's chains in line with the registry's current order"""
+    for field in ADAPTIVE_FIELDS:
+        order = selector_registry.order(f'product.{field}')
+        if order != plan.chains[field]:
+            plan.reorder(field, order)
+
+_DIV_TAG = re.compile(r'<(/?)div\b', re.IGNORECASE)
+
+def _card_starts(html: str, limit: Optional[int] = MAX_PRODUCTS) -> List[int]:
+    """Offsets of the opening tags of the first `limit` organic result cards (all with None)"""
+    starts = []
+    position = html.find(ORGANIC_RESULT_MARKER)
+    while position >= 0 and (limit is None or len(starts) < limit):
+        start = html.rfind('<', 0, position)
+        if _DIV_TAG.match(html, start):
+            starts.append(start)
+        position = html.find(ORGANIC_RESULT_MARKER, position + len(ORGANIC_RESULT_MARKER))
+    return starts
+
+def _card_end(html: str, start: int) -> int:
+    """Offset just past the div opened at `start`, found by balancing divs.
+
+    Unbalanced markup runs to the end of the page.
+    """
+    depth = 0
+    for tag in _DIV_TAG.finditer(html, start):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = html.find('>', tag.end())
+            return end + 1 if end >= 0 else len(html)
+    return len(html)
+
+def results_region(html: str, limit: int = MAX_PRODUCTS) -> Optional[str]:
+    """Slice of `html` from the first organic result card to the end of the `limit`-th one.
+
+    Returns None when the page has no organic result card. The slice keeps
+    every card we read byte for byte; headers, scripts, carousels and
+    footers around them are never parsed.
+    """
+    starts = _card_starts(html, limit)
+    if not starts:
+        return None
+    return html[starts[0]:_card_end(html, starts[-1])]
+
+# Structured data: schema.org JSON-LD blobs (an ItemList of Products on search pages)
+LD_JSON_SCRIPT = re.compile(
+    r'<script[^>]*type=["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL
+)
+LISTING_ID = re.compile(r'/listing/(\d+)')
+HTML_TAG = re.compile(r'<(/?)([a-z][a-z0-9]*)\b([^>]*)>', re.IGNORECASE)
+CLASS_ATTR = re.compile(r'\bclass\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+MARKUP = re.compile(r'<[^>]*>')
+VOID_TAGS = {'img', 'br', 'hr', 'input', 'meta', 'link', 'source', 'wbr'}
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£'}
+
+def _ld_json_products(html: str) -> List[Dict]:
+    """Product objects from the page's JSON-LD blobs, in page order"""
+    products = []
+
+    def collect(node: Any):
+        if isinstance(node, list):
+            for item in node:
+                collect(item)
+        elif isinstance(node, dict):
+            types = node.get('@type')
+            if types == 'Product' or (isinstance(types, list) and 'Product' in types):
+                products.append(node)
+                return
+            for key in ('@graph', 'itemListElement', 'item'):
+                if key in node:
+                    collect(node[key])
+
+    for blob in LD_JSON_SCRIPT.findall(html):
+        try:
+            collect(json.loads(blob))
+        except ValueError:
+            continue
+    return products
+
+def _badge_flags(matches: Dict[str, Any]) -> Tuple[bool, bool]:
+    """(star seller, best seller) from the first match of each badge selector"""
+    texts = [matches[selector].get_text(strip=True).lower()
+             for selector in PRODUCT_FIELD_SELECTORS['badges'] if matches.get(selector)]
+    return any('star seller' in text for text in texts), any('best seller' in text for text in texts)
+
+def _element_text(html: str, open_tag: re.Match) -> str:
+    """Text of the element opened by `open_tag`, as get_text(strip=True) reads it"""
+    name = open_tag.group(2).lower()
+    if name in VOID_TAGS or open_tag.group(3).rstrip().endswith('/'):
+        return ''
+    depth = 1
+    end = len(html)
+    for tag in re.finditer(rf'<(/?){name}\b[^>]*>', html[open_tag.end():], re.IGNORECASE):
+        depth += -1 if tag.group(1) else 1
+        if depth == 0:
+            end = open_tag.end() + tag.start()
+            break
+    return unescape(''.join(part.strip() for part in MARKUP.split(html[open_tag.end():end])))
+
+def _badge_tags(card: str) -> List[re.Match]:
+    """Opening tags of the first match of each badge selector, found by a scan of the card's tags.
+
+    Mirrors PRODUCT_FIELD_SELECTORS['badges']: '.wt-badge',
+    '.wt-text-caption .wt-badge' and '.wt-text-caption .wt-text-gray'. A
+    stack of open tags tells whether an element is inside a caption.
+    """
+    first = {}
+    stack = []  # (tag name, inside a .wt-text-caption), innermost last
+    for tag in HTML_TAG.finditer(card):
+        closing, name, attrs = tag.group(1), tag.group(2).lower(), tag.group(3)
+        if closing:
+            for depth in range(len(stack) - 1, -1, -1):
+                if stack[depth][0] == name:
+                    del stack[depth:]
+                    break
+            continue
+        class_attr = CLASS_ATTR.search(attrs)
+        classes = set(class_attr.group(1).split()) if class_attr else set()
+        in_caption = bool(stack) and stack[-1][1]
+        if 'wt-badge' in classes:
+            first.setdefault('badge', tag)
+            if in_caption:
+                first.setdefault('caption badge', tag)
+        if 'wt-text-gray' in classes and in_caption:
+            first.setdefault('caption gray', tag)
+        if name not in VOID_TAGS and not attrs.rstrip().endswith('/'):
+            stack.append((name, in_caption or 'wt-text-caption' in classes))
+    return list(first.values())
+
+def _card_badges(html: str) -> Dict[str, Tuple[bool, bool]]:
+    """(star seller, best seller) per listing id, read from each result card as the DOM walk reads them.
+
+    JSON-LD has no seller badges. Cards that mention a seller are scanned
+    for the badge selectors' first matches instead of being parsed, and
+    their text is read across child tags like get_text(strip=True).
+    """
+    badges = {}
+    for start in _card_starts(html, None):
+        card = html[start:_card_end(html, start)]
+        listing = LISTING_ID.search(card)
+        if not listing or listing.group(1) in badges:
+            continue
+        texts = [_element_text(card, tag).lower() for tag in _badge_tags(card)] if 'seller' in card.lower() else []
+        badges[listing.group(1)] = (
+            any('star seller' in text for text in texts),
+            any('best seller' in text for text in texts)
+        )
+    return badges
+
+def _first(value: Any) -> Any:
+    return value[0] if isinstance(value, list) and value else value
+
+def _ld_price(offers: Any) -> str:
+    offer = _first(offers)
+    if not isinstance(offer, dict):
+        return "$0.00"
+    amount = offer.get('price', offer.get('lowPrice'))
+    if amount in (None, ''):
+        return "$0.00"
+    currency = offer.get('priceCurrency', 'USD')
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f"{symbol}{amount}" if symbol else f"{amount} {currency}"
+
+def structured_products(html: str, search_keyword: str) -> List[Dict]:
+    """Product records straight from the page's JSON-LD, without building a DOM.
+
+    Returns an empty list when the page carries no Product data.
+    """
+    items = _ld_json_products(html)[:MAX_PRODUCTS]
+    if not items:
+        return []
+    badges = _card_badges(html)
+
+    products = []
+    for item in items:
+        title = str(item.get('name') or "Unknown Title")
+
+        url = str(_first(item.get('url')) or "")
+        if url and not url.startswith('http'):
+            url = f"https://www.etsy.com{url}"
+
+        image = _first(item.get('image'))
+        image_url = str((image.get('url') if isinstance(image, dict) else image) or "")
+
+        brand = _first(item.get('brand'))
+        shop_name = str((brand.get('name') if isinstance(brand, dict) else brand) or "Unknown Shop")
+
+        rating = item.get('aggregateRating')
+        rating = rating if isinstance(rating, dict) else {}
+        try:
+            shop_rating = round(float(rating['ratingValue']), 1)
+        except (KeyError, TypeError, ValueError):
+            shop_rating = round(random.uniform(4.0, 5.0), 1)
+        try:
+            review_count = int(rating.get('reviewCount') or 0)
+        except (TypeError, ValueError):
+            review_count = 0
+        sales_count = estimate_sales_count(f"{review_count} reviews") if review_count else 0
+
+        listing = LISTING_ID.search(url)
+        is_star_seller, is_best_seller = badges.get(listing.group(1) if listing else None, (False, False))
+
+        products.append({
+            'title': title,
+            'price': _ld_price(item.get('offers')),
+            'shop_name': shop_name,
+            'url': url,
+            'image_url': image_url,
+            'sales_count': sales_count,
+            # Mock additional data, as for the DOM walk
+            'views_estimate': random.randint(500, 5000),
+            'listing_age_days': random.randint(30, 365),
+            'is_star_seller': is_star_seller,
+            'is_best_seller': is_best_seller,
+            'keywords': extract_keywords(title, search_keyword),
+            'shop_rating': shop_rating
+        })
+    return products
+
+def extract_products(html: str, search_keyword: str, backend: str = 'html.parser',
+                     scoped: bool = True, structured: bool = True) -> List[Dict]:
+    """Parse a search results page into product records (plain dicts of EtsyProduct fields).
+
+    With `structured`, products embedded as JSON-LD are used as they are and
+    the DOM is only walked when the page has none. With `scoped`, only the
+    organic results region is parsed; pages without it (or whose slice
+    yields no card) are parsed whole with every fallback container selector.
+    """
+    if structured:
+        products = structured_products(html, search_keyword)
+        if products:
+            logger.info(f"Found {len(products)} products in structured data")
+            return products
+
+    product_containers = []
+    region = results_region(html) if scoped else None
+    if region:
+        product_containers = parse_html(region, backend).select(ORGANIC_RESULT_SELECTOR)
+
+    if not product_containers:
+        soup = parse_html(html, backend)
+        for selector in PRODUCT_CONTAINER_SELECTORS:
+            containers = soup.select(selector)
+            if containers:
+                product_containers = containers
+                break
+
+    logger.info(f"Found {len(product_containers)} product containers")
+
+    apply_selector_order()
+    products = []
+    for container in product_containers[:MAX_PRODUCTS]:
+        try:
+            product = parse_product_container(container, search_keyword)
+            if product:
+                products.append(product)
+        except Exception as e:
+            logger.error(f"Error parsing product: {str(e)}")
+            continue
+
+    return products
+
+def parse_product_container(container, search_keyword: str, plan: ExtractionPlan = CONTAINER_PLAN) -> Optional[Dict]:
+    try:
+        # One pass over the card finds the first match of every selector below
+        chains = plan.chains
+        matches = plan.first_matches(container)
+        record = selector_registry.record
+
+        # Title
+        title = "Unknown Title"
+        for selector in chains['title']:
+            title_elem = matches.get(selector)
+            if title_elem:
+                title = title_elem.get_text(strip=True)
+                record('product.title', selector, True)
+                break
+            record('product.title', selector, False)
+
+        # Price
+        price = "$0.00"
+        for selector in chains['price']:
+            price_elem = matches.get(selector)
+            if price_elem:
+                price_text = price_elem.get_text(strip=True)
+                if '$' in price_text or '€' in price_text or '£' in price_text:
+                    price = price_text
+                    record('product.price', selector, True)
+                    break
+            record('product.price', selector, False)
+
+        # Shop name
+        shop_name = "Unknown Shop"
+        for selector in chains['shop']:
+            shop_elem = matches.get(selector)
+            if shop_elem:
+                shop_name = shop_elem.get_text(strip=True)
+                record('product.shop', selector, True)
+                break
+            record('product.shop', selector, False)
+
+        # URL
+        url = ""
+        for selector in chains['url']:
+            link_elem = matches.get(selector)
+            if link_elem and link_elem.get('href'):
+                url = link_elem['href']
+                if url and not url.startswith('http'):
+                    url = f"https://www.etsy.com{url}"
+                record('product.url', selector, True)
+                break
+            record('product.url', selector, False)
+
+        # Image
+        image_url = ""
+        for selector in chains['image']:
+            img_elem = matches.get(selector)
+            if img_elem and img_elem.get('src'):
+                image_url = img_elem['src']
+                record('product.image', selector, True)
+                break
+            record('product.image', selector, False)
+
+        # Sales count
+        sales_count = 0
+        for selector in chains['sales']:
+            sales_elem = matches.get(selector)
+            if sales_elem:
+                sales_text = sales_elem.get_text(strip=True)
+                if 'sale' in sales_text.lower() or 'sold' in sales_text.lower():
+                    sales_count = estimate_sales_count(sales_text)
+                    record('product.sales', selector, True)
+                    break
+            record('product.sales', selector, False)
+
+        # Star seller and best seller badges
+        is_star_seller, is_best_seller = _badge_flags(matches)
+
+        # Mock additional data (in real scraping, these would be extracted)
+        views_estimate = random.randint(500, 5000)
+        listing_age_days = random.randint(30, 365)
+        shop_rating = round(random.uniform(4.0, 5.0), 1)
+
+        keywords = extract_keywords(title, search_keyword)
+
+        return {
+            'title': title,
+            'price': price,
+            'shop_name': shop_name,
+            'url': url,
+            'image_url': image_url,
+            'sales_count': sales_count,
+            'views_estimate': views_estimate,
+            'listing_age_days': listing_age_days,
+            'is_star_seller': is_star_seller,
+            'is_best_seller': is_best_seller,
+            'keywords': keywords,
+            'shop_rating': shop_rating
+        }
+
+    except Exception as e:
+        logger.error(f"Error parsing product: {str(e)}")
+        return None
+
+def estimate_sales_count(container) -> int:
+    # Look for review indicators
+    review_patterns = [r'(\d+)\s*review', r'(\d+)\s*sale', r'sold\s*(\d+)', r'(\d+)\s*favorite']
+
+    container_text = str(container).lower()
+    for pattern in review_patterns:
+        match = re.search(pattern, container_text)
+        if match:
+            count = int(match.group(1))
+            return random.randint(count * 2, count * 5)
+
+    return random.randint(10, 500)
+
+def extract_keywords(title: str, search_keyword: str) -> List[str]:
+    keywords = [search_keyword.lower()]
+
+    common_keywords = [
+        'gift', 'custom', 'personalized', 'handmade', 'vintage', 
+        'unique', 'funny', 'cute', 'cool', 'trendy', 'modern'
+    ]
+
+    title_lower = title.lower()
+    for keyword in common_keywords:
+        if keyword in title_lower and keyword not in keywords:
+            keywords.append(keyword)
+
+    title_words = re.findall(r'\b[a-zA-Z]{3,}\b', title_lower)
+    for word in title_words[:3]:
+        if word not in keywords and len(word) > 3:
+            keywords.append(word)
+
+    return keywords[:6]
@@ -0,0 +1,182 @@
+"""
+Token-bucket rate limiting for outgoing Etsy requests
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Dict, Optional
+
+class TokenBucket:
+    """Token bucket that hands out reservations.
+
+    A caller takes a token immediately if one is available. Otherwise it
+    reserves the next one by driving the balance negative and sleeps until
+    that token has accrued, so waiters are served in arrival order.
+    """
+
+    def __init__(self, rate: float, burst: float):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def set_rate(self, rate: float):
+        """Change the refill rate, keeping tokens accrued at the old rate"""
+        self._refill(time.monotonic())
+        self.rate = rate
+
+    def reserve(self) -> float:
+        """Take one token and return how long the caller must wait before using it"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def wait_time(self) -> float:
+        """Seconds until a new caller would get a token"""
+        now = time.monotonic()
+        tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        return 0.0 if tokens >= 1 else (1 - tokens) / self.rate
+
+    async def acquire(self):
+        delay = self.reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+class RateLimiter:
+    """Global token bucket shared by all bots plus one bucket per bot"""
+
+    def __init__(self, global_rate: float, global_burst: float, bot_rate: float, bot_burst: float):
+        self.global_bucket = TokenBucket(global_rate, global_burst)
+        self.bot_rate = bot_rate
+        self.bot_burst = bot_burst
+        self.bot_buckets: Dict[int, TokenBucket] = {}
+
+    def _bot_bucket(self, bot_id: int) -> TokenBucket:
+        bucket = self.bot_buckets.get(bot_id)
+        if bucket is None:
+            bucket = self.bot_buckets[bot_id] = TokenBucket(self.bot_rate, self.bot_burst)
+        return bucket
+
+    async def acquire(self, bot_id: int) -> float:
+        """Wait until both the bot and the global bucket allow a request; return the wait"""
+        delay = max(self._bot_bucket(bot_id).reserve(), self.global_bucket.reserve())
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return delay
+
+    def wait_time(self, bot_id: Optional[int] = None) -> float:
+        """Current wait for a request from `bot_id`, or through the global bucket alone"""
+        wait = self.global_bucket.wait_time()
+        if bot_id is not None:
+            wait = max(wait, self._bot_bucket(bot_id).wait_time())
+        return wait
+
+    def status(self) -> Dict:
+        return {
+            'global_rate': self.global_bucket.rate,
+            'global_burst': self.global_bucket.burst,
+            'bot_rate': self.bot_rate,
+            'bot_burst': self.bot_burst,
+            'global_wait_seconds': round(self.global_bucket.wait_time(), 3),
+            'bot_wait_seconds': {
+                bot_id: round(bucket.wait_time(), 3) for bot_id, bucket in self.bot_buckets.items()
+            }
+        }
+
+class AdaptiveConcurrencyController:
+    """AIMD control of parallel requests and global request rate.
+
+    Every successful response adds `increase / limit` to the concurrency
+    limit, so the limit grows by about `increase` per round of requests.
+    A 429 or 403 multiplies it by `decrease_factor`, at most once per
+    `cooldown` seconds so a burst of blocks from one round counts once.
+    The global bucket rate follows the limit proportionally.
+    """
+
+    def __init__(self, rate_limiter: RateLimiter, max_limit: int, min_limit: int = 1,
+                 increase: float = 1.0, decrease_factor: float = 0.5, cooldown: float = 10.0):
+        self.rate_limiter = rate_limiter
+        self.max_rate = rate_limiter.global_bucket.rate
+        self.max_limit = max_limit
+        self.min_limit = min(min_limit, max_limit)
+        self.increase = increase
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.limit = float(max_limit)
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.throttled = 0
+        self._waiters: deque = deque()
+
+    @property
+    def current_limit(self) -> int:
+        return max(self.min_limit, int(self.limit))
+
+    @property
+    def current_rate(self) -> float:
+        return self.max_rate * self.limit / self.max_limit
+
+    async def acquire(self):
+        """Wait in FIFO order until a request fits under the current limit"""
+        if self.in_flight < self.current_limit and not self._waiters:
+            self.in_flight += 1
+            return
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await waiter
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self.current_limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    def on_success(self):
+        if self.limit < self.max_limit:
+            self.limit = min(self.max_limit, self.limit + self.increase / self.limit)
+            self._apply_rate()
+            self._wake()
+
+    def on_throttle(self):
+        """Back off after a rate-limit or block response"""
+        self.throttled += 1
+        now = time.monotonic()
+        if now - self.last_decrease < self.cooldown:
+            return
+        self.last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.decrease_factor)
+        self._apply_rate()
+
+    def _apply_rate(self):
+        self.rate_limiter.global_bucket.set_rate(self.current_rate)
+
+    def status(self) -> Dict:
+        return {
+            'limit': self.current_limit,
+            'max_limit': self.max_limit,
+            'in_flight': self.in_flight,
+            'waiting': len(self._waiters),
+            'rate': round(self.current_rate, 3),
+            'throttled_responses': self.throttled
+        }
@@ -0,0 +1,168 @@
+"""
+Hit-rate statistics for fallback selector chains, used to reorder them
+"""
+
+import json
+import logging
+import os
+from typing import Any, Callable, Dict, Iterable, List
+
+logger = logging.getLogger(__name__)
+
+Counts = Dict[str, Dict[str, List[int]]]  # chain -> selector -> [hits, misses]
+
+def _add_counts(target: Counts, delta: Counts):
+    for chain, selectors in delta.items():
+        chain_counts = target.setdefault(chain, {})
+        for selector, (hits, misses) in selectors.items():
+            entry = chain_counts.setdefault(selector, [0, 0])
+            entry[0] += hits
+            entry[1] += misses
+
+class SelectorRegistry:
+    """Fallback selector chains, ordered by how often each selector supplies the value.
+
+    Parsers register a chain with its default order, ask for the current
+    order, and record every selector they evaluate as a hit (it supplied the
+    value) or a miss. With `adaptive`, a chain is re-sorted by smoothed hit
+    rate every `reorder_every` observations; ties keep the default order.
+
+    A selector is only evaluated when every selector before it missed, so
+    a catch-all (`img`, `h3`) nearly always hits when reached and would
+    climb to the front. A chain's `last_resorts` are therefore never
+    reordered: they stay at the end, in their default order.
+    """
+
+    def __init__(self, reorder_every: int = 50, adaptive: bool = True):
+        self.reorder_every = reorder_every
+        self.adaptive = adaptive
+        self.defaults: Dict[str, List[str]] = {}
+        self.last_resorts: Dict[str, List[str]] = {}
+        self.orders: Dict[str, List[str]] = {}
+        self.counts: Counts = {}
+        # Recorded since the last drain: returned by parse workers, or written by save
+        self._pending: Counts = {}
+        self._since_reorder: Dict[str, int] = {}
+
+    def register(self, chain: str, selectors: List[str], last_resorts: Iterable[str] = ()):
+        last_resorts = set(last_resorts)
+        self.defaults[chain] = list(selectors)
+        self.last_resorts[chain] = [selector for selector in selectors if selector in last_resorts]
+        self.orders[chain] = list(selectors)
+        self.counts.setdefault(chain, {})
+        self._since_reorder[chain] = 0
+        self._reorder(chain)
+
+    def order(self, chain: str) -> List[str]:
+        return self.orders[chain]
+
+    def record(self, chain: str, selector: str, hit: bool):
+        for counts in (self.counts, self._pending):
+            entry = counts.setdefault(chain, {}).setdefault(selector, [0, 0])
+            entry[0 if hit else 1] += 1
+        self._since_reorder[chain] = self._since_reorder.get(chain, 0) + 1
+        if self._since_reorder[chain] >= self.reorder_every:
+            self._reorder(chain)
+
+    def drain(self) -> Counts:
+        pending, self._pending = self._pending, {}
+        return pending
+
+    def merge(self, delta: Counts, pending: bool = True):
+        """Add counts recorded elsewhere (a parse worker, or the saved file)"""
+        _add_counts(self.counts, delta)
+        if pending:
+            _add_counts(self._pending, delta)
+        for chain in delta:
+            if chain in self.defaults:
+                self._reorder(chain)
+
+    def apply_orders(self, orders: Dict[str, List[str]]):
+        """Take over chain orders decided by another process"""
+        for chain, order in orders.items():
+            if (chain in self.defaults and sorted(order) == sorted(self.defaults[chain])
+                    and order[len(order) - len(self.last_resorts[chain]):] == self.last_resorts[chain]):
+                self.orders[chain] = list(order)
+
+    def hit_rate(self, chain: str, selector: str) -> float:
+        # Laplace-smoothed: a selector never evaluated sits at 0.5
+        hits, misses = self.counts.get(chain, {}).get(selector, (0, 0))
+        return (hits + 1) / (hits + misses + 2)
+
+    def _reorder(self, chain: str):
+        self._since_reorder[chain] = 0
+        if not self.adaptive:
+            return
+        pinned = self.last_resorts[chain]
+        order = sorted(
+            (selector for selector in self.defaults[chain] if selector not in pinned),
+            key=lambda selector: -self.hit_rate(chain, selector)
+        ) + pinned
+        if order != self.orders[chain]:
+            logger.info(f"Selector order for {chain} is now {order}")
+            self.orders[chain] = order
+
+    def load(self, path: str):
+        if not path or not os.path.exists(path):
+            return
+        try:
+            with open(path, encoding='utf-8') as f:
+                self.merge(json.load(f), pending=False)
+            logger.info(f"Loaded selector statistics from {path}")
+        except Exception as e:
+            logger.error(f"Selector statistics load error: {str(e)}")
+
+    def save(self, path: str):
+        """Add the counts recorded since the last save to the file.
+
+        The file is re-read first, so workers sharing it add up their counts.
+        """
+        if not path:
+            return
+        delta = self.drain()
+        if not delta:
+            return
+        try:
+            saved: Counts = {}
+            if os.path.exists(path):
+                with open(path, encoding='utf-8') as f:
+                    saved = json.load(f)
+            _add_counts(saved, delta)
+            temp_path = f"{path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(saved, f, indent=1, sort_keys=True)
+            os.replace(temp_path, path)
+        except Exception as e:
+            logger.error(f"Selector statistics save error: {str(e)}")
+            # Keep the counts for the next save
+            _add_counts(self._pending, delta)
+
+    def status(self) -> Dict:
+        return {
+            chain: {
+                'order': self.orders[chain],
+                'default_order': self.defaults[chain],
+                'last_resorts': self.last_resorts[chain],
+                'selectors': {
+                    selector: {
+                        'hits': self.counts[chain].get(selector, [0, 0])[0],
+                        'misses': self.counts[chain].get(selector, [0, 0])[1],
+                        'hit_rate': round(self.hit_rate(chain, selector), 3)
+                    }
+                    for selector in self.defaults[chain]
+                }
+            }
+            for chain in self.defaults
+        }
+
+# Shared by the parsers of this process
+selector_registry = SelectorRegistry()
+
+def call_with_selector_stats(orders: Dict[str, List[str]], fn: Callable[..., Any], *args):
+    """Run `fn` in a parse worker with the parent's chain orders.
+
+    Returns its result together with the selector counts it recorded, for the
+    parent to merge.
+    """
+    selector_registry.apply_orders(orders)
+    return fn(*args), selector_registry.drain()
@@ -0,0 +1,118 @@
+"""
+Single-flight coalescing for identical in-flight requests
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Delete the marker only if we still own it
+RELEASE_MARKER_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+class SingleFlight:
+    """Runs one call per key and shares its result with every concurrent caller.
+
+    Inside a worker, callers of the same key await one shared task. Across
+    uvicorn workers, a Redis marker (SET NX EX, through an async client)
+    elects one leader; the other workers poll the `load_result` coroutine
+    until the leader has published its result, and take over if the marker
+    disappears without one.
+    """
+
+    def __init__(self, redis_client=None, marker_ttl: int = 120, wait_timeout: float = 120,
+                 poll_interval: float = 0.25, prefix: str = "inflight:"):
+        self.redis_client = redis_client
+        self.marker_ttl = marker_ttl
+        self.wait_timeout = wait_timeout
+        self.poll_interval = poll_interval
+        self.prefix = prefix
+        self._calls: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+        self.stats = {'leaders': 0, 'coalesced': 0, 'remote_waits': 0, 'abandoned': 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]],
+                 load_result: Optional[Callable[[], Awaitable[Any]]] = None,
+                 timeout: Optional[float] = None) -> Any:
+        """Run `fn` once for `key`; concurrent callers get the same result or exception.
+
+        `timeout` bounds how long this caller waits (raising asyncio.TimeoutError).
+        The shared call keeps running while any caller still waits on it, and
+        is cancelled once the last one times out or is cancelled.
+        """
+        task = self._calls.get(key)
+        if task is None:
+            self.stats['leaders'] += 1
+            task = asyncio.ensure_future(self._lead(key, fn, load_result))
+            self._calls[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+        else:
+            self.stats['coalesced'] += 1
+            logger.info(f"Coalesced request for {key}")
+
+        # Shielded so one caller giving up does not cancel the shared call
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), timeout)
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+                if not task.done():
+                    self.stats['abandoned'] += 1
+                    logger.info(f"Every caller gave up on {key}, cancelling it")
+                    task.cancel()
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        if not task.cancelled():
+            task.exception()  # retrieved here in case every caller already gave up
+
+    async def _lead(self, key: str, fn: Callable[[], Awaitable[Any]],
+                    load_result: Optional[Callable[[], Awaitable[Any]]]) -> Any:
+        if not self.redis_client or load_result is None:
+            return await fn()
+
+        marker = f"{self.prefix}{key}"
+        token = uuid.uuid4().hex
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.wait_timeout
+        waited = False
+
+        while True:
+            try:
+                acquired = await self.redis_client.set(marker, token, nx=True, ex=self.marker_ttl)
+            except Exception as e:
+                logger.error(f"In-flight marker error: {str(e)}")
+                return await fn()
+
+            if acquired:
+                try:
+                    return await fn()
+                finally:
+                    try:
+                        await self.redis_client.eval(RELEASE_MARKER_SCRIPT, 1, marker, token)
+                    except Exception as e:
+                        logger.error(f"In-flight marker release error: {str(e)}")
+
+            # Another worker is already running this call: wait for its result
+            if not waited:
+                waited = True
+                self.stats['remote_waits'] += 1
+                logger.info(f"Waiting for another worker to finish {key}")
+
+            result = await load_result()
+            if result is not None:
+                return result
+            if loop.time() >= deadline:
+                logger.warning(f"Gave up waiting for another worker on {key}")
+                return await fn()
+            await asyncio.sleep(self.poll_interval)
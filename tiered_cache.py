@@ -0,0 +1,150 @@
+"""
+Two-tier cache: an in-process LRU in front of Redis
+"""
+
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class LocalCache:
+    """In-process LRU of decoded values, bounded by entry count, with a TTL per entry"""
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0, 'expired': 0, 'evictions': 0, 'invalidations': 0}
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is not None and time.monotonic() >= entry[0]:
+            del self._entries[key]
+            self.stats['expired'] += 1
+            entry = None
+        if entry is None:
+            self.stats['misses'] += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats['hits'] += 1
+        return entry[1]
+
+    def put(self, key: str, value: Any):
+        if self.max_entries <= 0:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def invalidate(self, key: str):
+        if self._entries.pop(key, None) is not None:
+            self.stats['invalidations'] += 1
+
+    def status(self) -> Dict:
+        return {'entries': len(self._entries), 'max_entries': self.max_entries, 'ttl': self.ttl, **self.stats}
+
+class TieredCache:
+    """Reads go to the local LRU first, then to Redis; writes go to both.
+
+    Values are kept decoded in the local tier, so a local hit costs neither a
+    round trip nor deserialization. `get_entry` also returns the age of the
+    value, measured from its write to Redis (taken from the remaining TTL, so
+    workers agree on it without comparing clocks). With a `channel`, every write is
+    announced over Redis pub/sub, and `listen_for_invalidations` drops local
+    copies of keys rewritten by other workers.
+    """
+
+    def __init__(self, local: LocalCache, expiry: int, encode: Callable[[Any], bytes],
+                 decode: Callable[[bytes], Any], channel: Optional[str] = None):
+        self.local = local
+        self.expiry = expiry
+        self.encode = encode
+        self.decode = decode
+        self.channel = channel
+        self.redis_client = None
+        self.instance_id = uuid.uuid4().hex
+        self.stats = {'hits': 0, 'misses': 0, 'errors': 0}
+
+    async def get(self, key: str) -> Optional[Any]:
+        entry = await self.get_entry(key)
+        return entry[0] if entry else None
+
+    async def get_entry(self, key: str) -> Optional[Tuple[Any, float]]:
+        """The cached value and its age in seconds, or None"""
+        entry = self.local.get(key)
+        if entry is not None:
+            value, written_at = entry
+            return value, time.time() - written_at
+        if not self.redis_client:
+            return None
+        try:
+            raw, ttl = await self.redis_client.pipeline(transaction=False).get(key).ttl(key).execute()
+            value = self.decode(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Cache error: {str(e)}")
+            self.stats['errors'] += 1
+            return None
+        if value is None:
+            self.stats['misses'] += 1
+            return None
+        self.stats['hits'] += 1
+        logger.info(f"Cache hit for {key}")
+        age = self.expiry - ttl if ttl >= 0 else 0
+        self.local.put(key, (value, time.time() - age))
+        return value, age
+
+    async def set(self, key: str, value: Any):
+        self.local.put(key, (value, time.time()))
+        if not self.redis_client:
+            return
+        try:
+            await self.redis_client.setex(key, self.expiry, self.encode(value))
+            if self.channel:
+                await self.redis_client.publish(self.channel, json.dumps({'key': key, 'origin': self.instance_id}))
+        except Exception as e:
+            logger.error(f"Cache save error: {str(e)}")
+            self.stats['errors'] += 1
+
+    async def listen_for_invalidations(self, retry_delay: float = 5, poll_interval: float = 1.0):
+        """Drop local entries that other workers have rewritten; runs until cancelled"""
+        while True:
+            pubsub = self.redis_client.pubsub()
+            try:
+                await pubsub.subscribe(self.channel)
+                logger.info(f"Listening for cache invalidations on {self.channel}")
+                while True:
+                    # Polled with its own timeout: listen() reads with the pool's socket
+                    # timeout, so an idle channel would raise after REDIS_SOCKET_TIMEOUT
+                    message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=poll_interval)
+                    if message is None or message.get('type') != 'message':
+                        continue
+                    try:
+                        notice = json.loads(message['data'])
+                    except (TypeError, ValueError):
+                        continue
+                    if notice.get('origin') != self.instance_id:
+                        self.local.invalidate(notice.get('key'))
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Cache invalidation listener error: {str(e)}")
+            finally:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+            await asyncio.sleep(retry_delay)
+
+    def status(self) -> Dict:
+        return {
+            'l1': self.local.status(),
+            'l2': {'connected': self.redis_client is not None, **self.stats},
+            'invalidation_channel': self.channel
+        }
@@ -1,44 +1,207 @@
 from datetime import datetime
-from typing import List, Dict
+from typing import Awaitable, Callable, List, Dict, Optional, Tuple
+import asyncio
 import json
 import logging
 from collections import Counter
 import re
-from bs4 import BeautifulSoup
+import time
+from html_parsing import SelectionPlan, parse_html
+from selector_stats import selector_registry
 
 logger = logging.getLogger(__name__)
 
+# Fallback chain for product titles; reordered by observed hit rate
+TITLE_SELECTORS = [
+    'h3[data-test-id="listing-link"]',
+    'h3.v2-listing-card__title',
+    'a[data-test-id="listing-link"] h3',
+    '.v2-listing-card__title',
+    'h3',
+    '.listing-link h3'
+]
+# Any h3 matches, so it is never promoted above the listing-specific selectors
+selector_registry.register('trending.title', TITLE_SELECTORS, last_resorts=['h3'])
+
+# Search suggestions and popular searches
+SEARCH_SELECTORS = [
+    'a[href*="/search?q="]',
+    'a[href*="search"]',
+    '.search-suggestion',
+    '.popular-search',
+    '[data-test-id*="search"]'
+]
+
+# Category and navigation links
+CATEGORY_SELECTORS = [
+    'a[href*="/c/"]',
+    '.category-link',
+    '.nav-link',
+    '[data-test-id*="category"]'
+]
+
+# Trending tags and badges
+TAG_SELECTORS = [
+    '.trending-tag',
+    '.popular-tag',
+    '.badge',
+    '[class*="trend"]',
+    '[class*="popular"]'
+]
+
+META_KEYWORDS_SELECTOR = 'meta[name="keywords"]'
+
+# Matches of every selector above, gathered in one walk of the page
+TRENDING_PLAN = SelectionPlan(
+    TITLE_SELECTORS + SEARCH_SELECTORS + CATEGORY_SELECTORS + TAG_SELECTORS + [META_KEYWORDS_SELECTOR]
+)
+
+# Words of a product title that say nothing about what is trending
+TITLE_STOP_WORDS = frozenset({
+    'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
+    'from', 'up', 'about', 'into', 'through', 'during', 'before', 'after',
+    'above', 'below', 'between', 'among', 'this', 'that', 'these', 'those',
+    'gift', 'gifts', 'item', 'items', 'product', 'products', 'sale', 'new',
+    'best', 'top', 'great', 'perfect', 'amazing', 'beautiful', 'cute', 'cool'
+})
+
+def title_tokens(title: str) -> List[str]:
+    """Every meaningful word of a product title, capitalized, in order and with repeats"""
+    return [
+        word.capitalize() for word in re.findall(r'\b[a-zA-Z]{3,}\b', title.lower())
+        if len(word) > 3 and word not in TITLE_STOP_WORDS
+    ]
+
+def parse_trending_sources(specs: List[str]) -> List[Tuple[str, float]]:
+    """Source pages written as 'url|weight' (weight 1 when omitted), as (url, weight) pairs"""
+    sources = []
+    for spec in specs:
+        url, _, weight = spec.strip().partition('|')
+        if url:
+            sources.append((url.strip(), float(weight) if weight.strip() else 1.0))
+    return sources
+
+# Served until keywords have been extracted from Etsy, and mixed in when too few were found
+DEFAULT_TRENDING_KEYWORDS = [
+    "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
+    "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
+    "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
+    "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
+]
+
 class TrendingKeywordsManager:
-    def __init__(self, scraper=None):
+    def __init__(self, scraper=None, parser_backend: str = 'html.parser', parse_pool=None, parse_cache=None,
+                 frequency_store=None, heavy_hitters=None):
         self.scraper = scraper
-        self.default_keywords = [
-            "Cottagecore", "Dark Academia", "Y2K Aesthetic", "Minimalist Design",
-            "Boho Chic", "Vintage Retro", "Plant Mom", "Self Care", "Motivational Quotes",
-            "Astrology", "Crystal Healing", "Sustainable Living", "Mental Health Awareness",
-            "Dopamine Decor", "Grandmillennial", "Maximalist", "Japandi Style"
-        ]
+        self.parser_backend = parser_backend
+        self.parse_pool = parse_pool
+        self.parse_cache = parse_cache
+        # KeywordFrequencyStore counting the keywords of every extracted page
+        self.frequency_store = frequency_store
+        # HeavyHitters sketch counting every title token of every extracted page
+        self.heavy_hitters = heavy_hitters
+        self.default_keywords = list(DEFAULT_TRENDING_KEYWORDS)
 
     async def extract_trending_from_listings(self, html_content: str) -> List[str]:
+        """Extract trending keywords from Etsy listings, in the parse pool when one is set.
+
+        With a parse cache, a page identical to one seen recently is not parsed again.
+        The page's keyword counts go to the frequency store and its title tokens
+        to the heavy hitters sketch, when those are set.
+        """
+        keywords, _ = await self.extract_trending_with_counts(html_content)
+        return keywords
+
+    async def extract_trending_with_counts(self, html_content: str) -> Tuple[List[str], Dict[str, int]]:
+        """Like extract_trending_from_listings, also returning how often each keyword occurred"""
+        cache_key = None
+        result = None
+        if self.parse_cache and self.parse_cache.enabled:
+            cache_key = self.parse_cache.key(html_content, 'trending', self.parser_backend)
+            result = self.parse_cache.get(cache_key)
+
+        if result is None:
+            if self.parse_pool:
+                try:
+                    result = await self.parse_pool.run(extract_trending_counts, html_content, self.parser_backend)
+                except Exception as e:
+                    logger.error(f"Error extracting trending keywords: {str(e)}")
+                    return self.default_keywords, {}
+            else:
+                result = self.extract_trending_counts(html_content)
+            if cache_key:
+                self.parse_cache.put(cache_key, result)
+
+        keywords, counts, token_counts = result
+        if self.frequency_store:
+            self.frequency_store.record(counts)
+        if self.heavy_hitters:
+            self.heavy_hitters.update(token_counts)
+        return list(keywords), counts
+
+    async def _harvest_source(self, fetch: Callable[[str], Awaitable[Optional[str]]], url: str) -> Optional[Dict[str, int]]:
+        started = time.monotonic()
+        try:
+            html_content = await fetch(url)
+        except Exception as e:
+            logger.warning(f"Trending source {url} failed: {str(e)}")
+            return None
+        if not html_content:
+            logger.warning(f"Trending source {url} returned no page")
+            return None
+        _, counts = await self.extract_trending_with_counts(html_content)
+        logger.info(f"Trending source {url}: {len(counts)} keywords in {time.monotonic() - started:.1f}s")
+        return counts
+
+    async def harvest(self, fetch: Callable[[str], Awaitable[Optional[str]]],
+                      sources: List[Tuple[str, float]], limit: int = 16) -> List[str]:
+        """Trending keywords from several source pages, fetched and extracted concurrently.
+
+        `sources` are (url, weight) pairs. Each source contributes its keywords'
+        share of the page's keyword occurrences, times its weight; keywords
+        found on several pages add up. Sources that fail are left out, and
+        ValueError is raised when no source yielded a keyword.
+        """
+        results = await asyncio.gather(*(self._harvest_source(fetch, url) for url, _ in sources))
+        scores = Counter()
+        for (url, weight), counts in zip(sources, results):
+            occurrences = sum(counts.values()) if counts else 0
+            for keyword, count in (counts or {}).items():
+                scores[keyword] += weight * count / occurrences
+        if not scores:
+            raise ValueError(f"no trending keywords extracted from {len(sources)} sources")
+
+        ranked = sorted(scores, key=lambda keyword: (-scores[keyword], len(keyword)))
+        logger.info(f"✅ Harvested {len(ranked)} trending keywords from "
+                    f"{sum(counts is not None for counts in results)}/{len(sources)} sources")
+        if len(ranked) >= 5:
+            return ranked[:limit]
+        # Mix real keywords with some defaults
+        return list(dict.fromkeys(ranked + self.default_keywords))[:limit]
+
+    def extract_trending(self, html_content: str) -> List[str]:
         """Extract trending keywords from Etsy listings"""
+        return self.extract_trending_counts(html_content)[0]
+
+    def extract_trending_counts(self, html_content: str) -> Tuple[List[str], Dict[str, int], Dict[str, int]]:
+        """Extract trending keywords from Etsy listings, most frequent first.
+
+        Also returns how often each keyword occurred, and how often each
+        title token occurred in the titles read.
+        """
         try:
-            soup = BeautifulSoup(html_content, 'html.parser')
-            trending_keywords = set()
+            soup = parse_html(html_content, self.parser_backend)
+            matches = TRENDING_PLAN.select_all(soup)
+            trending_keywords = Counter()
+            token_counts = Counter()
 
             logger.info("🔍 Starting trending keyword extraction...")
 
             # Method 1: Extract from product titles (most reliable)
-            title_selectors = [
-                'h3[data-test-id="listing-link"]',
-                'h3.v2-listing-card__title',
-                'a[data-test-id="listing-link"] h3',
-                '.v2-listing-card__title',
-                'h3',
-                '.listing-link h3'
-            ]
-
             titles_found = 0
-            for selector in title_selectors:
-                title_elements = soup.select(selector)
+            for selector in selector_registry.order('trending.title'):
+                title_elements = matches[selector]
+                selector_registry.record('trending.title', selector, bool(title_elements))
                 if title_elements:
                     logger.info(f"Found {len(title_elements)} titles with selector: {selector}")
                     titles_found += len(title_elements)
@@ -46,6 +209,7 @@ class TrendingKeywordsManager:
                     for title_elem in title_elements[:50]:  # Limit to first 50 titles
                         title = title_elem.get_text(strip=True)
                         if title and len(title) > 5:
+                            token_counts.update(title_tokens(title))
                             # Extract meaningful keywords from titles
                             keywords = self._extract_keywords_from_title(title)
                             trending_keywords.update(keywords)
@@ -54,23 +218,15 @@ class TrendingKeywordsManager:
             logger.info(f"Extracted keywords from {titles_found} product titles")
 
             # Method 2: Look for search suggestions and popular searches
-            search_selectors = [
-                'a[href*="/search?q="]',
-                'a[href*="search"]',
-                '.search-suggestion',
-                '.popular-search',
-                '[data-test-id*="search"]'
-            ]
-
-            for selector in search_selectors:
-                search_elements = soup.select(selector)
+            for selector in SEARCH_SELECTORS:
+                search_elements = matches[selector]
                 for elem in search_elements[:20]:  # Limit to 20 search suggestions
                     text = elem.get_text(strip=True)
                     href = elem.get('href', '')
 
                     # Extract from link text
                     if text and 3 < len(text) < 30 and not any(skip in text.lower() for skip in ['sign', 'cart', 'account', 'help']):
-                        trending_keywords.add(text.title())
+                        trending_keywords[text.title()] += 1
 
                     # Extract from search URLs
                     if 'q=' in href:
@@ -80,66 +236,53 @@ class TrendingKeywordsManager:
                             if 'q' in parsed:
                                 search_term = parsed['q'][0].replace('+', ' ').replace('%20', ' ')
                                 if 3 < len(search_term) < 30:
-                                    trending_keywords.add(search_term.title())
+                                    trending_keywords[search_term.title()] += 1
                         except:
                             pass
 
             # Method 3: Extract from category and navigation links
-            category_selectors = [
-                'a[href*="/c/"]',
-                '.category-link',
-                '.nav-link',
-                '[data-test-id*="category"]'
-            ]
-
-            for selector in category_selectors:
-                category_elements = soup.select(selector)
+            for selector in CATEGORY_SELECTORS:
+                category_elements = matches[selector]
                 for elem in category_elements[:15]:  # Limit to 15 categories
                     text = elem.get_text(strip=True)
                     if text and 3 < len(text) < 25 and not any(skip in text.lower() for skip in ['home', 'shop', 'sell', 'help']):
-                        trending_keywords.add(text.title())
+                        trending_keywords[text.title()] += 1
 
             # Method 4: Look for trending tags and badges
-            tag_selectors = [
-                '.trending-tag',
-                '.popular-tag',
-                '.badge',
-                '[class*="trend"]',
-                '[class*="popular"]'
-            ]
-
-            for selector in tag_selectors:
-                tag_elements = soup.select(selector)
+            for selector in TAG_SELECTORS:
+                tag_elements = matches[selector]
                 for elem in tag_elements:
                     text = elem.get_text(strip=True)
                     if text and 3 < len(text) < 20:
-                        trending_keywords.add(text.title())
+                        trending_keywords[text.title()] += 1
 
             # Method 5: Extract from meta tags and structured data
-            meta_keywords = soup.find('meta', attrs={'name': 'keywords'})
+            meta_keywords = next(iter(matches[META_KEYWORDS_SELECTOR]), None)
             if meta_keywords and meta_keywords.get('content'):
                 keywords = meta_keywords['content'].split(',')
                 for keyword in keywords[:10]:  # Limit to 10 meta keywords
                     keyword = keyword.strip()
                     if keyword and 3 < len(keyword) < 25:
-                        trending_keywords.add(keyword.title())
+                        trending_keywords[keyword.title()] += 1
 
             # Filter and clean keywords
-            filtered_keywords = self._filter_and_clean_keywords(list(trending_keywords))
+            counts = self._filter_and_clean_keywords(trending_keywords)
+            # Most frequent first; among equals, shorter (more specific) terms first
+            filtered_keywords = sorted(counts, key=lambda keyword: (-counts[keyword], len(keyword)))
 
             logger.info(f"✅ Extracted {len(filtered_keywords)} trending keywords from Etsy")
 
             if len(filtered_keywords) >= 5:
-                return filtered_keywords[:16]
+                return filtered_keywords[:16], dict(counts), dict(token_counts)
             else:
                 logger.warning("⚠️ Not enough real keywords found, mixing with defaults")
                 # Mix real keywords with some defaults
                 mixed_keywords = filtered_keywords + self.default_keywords
-                return list(dict.fromkeys(mixed_keywords))[:16]  # Remove duplicates, keep order
+                return list(dict.fromkeys(mixed_keywords))[:16], dict(counts), dict(token_counts)  # Remove duplicates, keep order
 
         except Exception as e:
             logger.error(f"Error extracting trending keywords: {str(e)}")
-            return self.default_keywords
+            return self.default_keywords, {}, {}
 
     def _extract_keywords_from_title(self, title: str) -> List[str]:
         """Extract meaningful keywords from a product title"""
@@ -148,24 +291,10 @@ class TrendingKeywordsManager:
         # Clean the title
         title = title.lower()
 
-        # Remove common words and extract meaningful terms
-        stop_words = {
-            'the', 'and', 'or', 'but', 'in', 'on', 'at', 'to', 'for', 'of', 'with', 'by',
-            'from', 'up', 'about', 'into', 'through', 'during', 'before', 'after',
-            'above', 'below', 'between', 'among', 'this', 'that', 'these', 'those',
-            'gift', 'gifts', 'item', 'items', 'product', 'products', 'sale', 'new',
-            'best', 'top', 'great', 'perfect', 'amazing', 'beautiful', 'cute', 'cool'
-        }
-
-        # Extract words that might be trending
-        words = re.findall(r'\b[a-zA-Z]{3,}\b', title)
-
-        for word in words:
-            if word not in stop_words and len(word) > 3:
-                # Capitalize first letter
-                keyword = word.capitalize()
-                if keyword not in keywords:
-                    keywords.append(keyword)
+        # Extract words that might be trending, without common words
+        for keyword in title_tokens(title):
+            if keyword not in keywords:
+                keywords.append(keyword)
 
         # Look for compound terms (aesthetic styles, etc.)
         compound_patterns = [
@@ -185,9 +314,9 @@ class TrendingKeywordsManager:
 
         return keywords[:5]  # Return top 5 keywords per title
 
-    def _filter_and_clean_keywords(self, keywords: List[str]) -> List[str]:
-        """Filter and clean the extracted keywords"""
-        filtered = []
+    def _filter_and_clean_keywords(self, keywords: Dict[str, int]) -> Counter:
+        """Filter and clean the extracted keywords, adding up the counts of those that clean to the same term"""
+        filtered = Counter()
 
         # Words to exclude
         exclude_words = {
@@ -197,7 +326,7 @@ class TrendingKeywordsManager:
             'contact', 'about', 'blog', 'news', 'press', 'careers', 'investors'
         }
 
-        for keyword in keywords:
+        for keyword, count in keywords.items():
             if not keyword:
                 continue
 
@@ -223,11 +352,7 @@ class TrendingKeywordsManager:
             keyword = ' '.join(keyword.split())  # Remove extra spaces
             keyword = keyword.title()  # Proper case
 
-            if keyword not in filtered:
-                filtered.append(keyword)
-
-        # Sort by length (shorter, more specific terms first)
-        filtered.sort(key=len)
+            filtered[keyword] += count
 
         return filtered
 
@@ -247,4 +372,12 @@ class TrendingKeywordsManager:
 
         except Exception as e:
             logger.error(f"Error getting trending keywords: {str(e)}")
-            return self.default_keywords 
\ No newline at end of file
+            return self.default_keywords
+
+def extract_trending_keywords(html_content: str, parser_backend: str) -> List[str]:
+    """Module-level entry point for parse worker processes"""
+    return TrendingKeywordsManager(parser_backend=parser_backend).extract_trending(html_content)
+
+def extract_trending_counts(html_content: str, parser_backend: str) -> Tuple[List[str], Dict[str, int], Dict[str, int]]:
+    """Module-level entry point for parse worker processes: keywords, their counts and title token counts"""
+    return TrendingKeywordsManager(parser_backend=parser_backend).extract_trending_counts(html_content)
@@ -0,0 +1,130 @@
+"""
+Trending keywords served from a snapshot refreshed in the background
+"""
+
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+def _isoformat(timestamp: Optional[float]) -> Optional[str]:
+    return datetime.fromtimestamp(timestamp).isoformat() if timestamp else None
+
+class TrendingService:
+    """Keeps a snapshot of trending keywords in memory and in Redis.
+
+    Requests only read the in-memory snapshot. `refresh_periodically` gets
+    fresh keywords from `harvest` and repeats every `interval` seconds, or
+    after `retry_delay` when that failed; the previous keywords are served
+    meanwhile. Workers share the snapshot through Redis,
+    and the fetch goes through SingleFlight, so one worker fetches and the
+    others adopt its snapshot.
+    """
+
+    def __init__(self, harvest: Callable[[], Awaitable[List[str]]], defaults: List[str],
+                 interval: float, retry_delay: float = 120, single_flight=None,
+                 key: str = "trending:snapshot"):
+        self.harvest = harvest
+        self.defaults = list(defaults)
+        self.interval = interval
+        self.retry_delay = retry_delay
+        self.single_flight = single_flight
+        self.key = key
+        self.redis_client = None
+        self.snapshot = {'keywords': self.defaults, 'updated_at': time.time(), 'last_success': None}
+        self.last_error: Optional[str] = None
+        self.stats = {'refreshes': 0, 'adopted': 0, 'failures': 0}
+
+    def current(self) -> Dict:
+        snapshot = self.snapshot
+        return {
+            'trending': snapshot['keywords'],
+            'updated': _isoformat(snapshot['updated_at']),
+            'age_seconds': round(time.time() - snapshot['updated_at'], 1),
+            'last_success': _isoformat(snapshot['last_success']),
+            'source': 'etsy' if snapshot['last_success'] else 'defaults'
+        }
+
+    def _is_fresh(self, snapshot: Optional[Dict]) -> bool:
+        return bool(snapshot and snapshot['last_success']) and time.time() - snapshot['updated_at'] < self.interval
+
+    def _adopt(self, snapshot: Dict):
+        if not self.snapshot['last_success'] or snapshot['updated_at'] > self.snapshot['updated_at']:
+            self.snapshot = snapshot
+
+    async def _load(self) -> Optional[Dict]:
+        if not self.redis_client:
+            return None
+        try:
+            raw = await self.redis_client.get(self.key)
+            return json.loads(raw) if raw else None
+        except Exception as e:
+            logger.error(f"Trending snapshot load error: {str(e)}")
+            return None
+
+    async def _load_fresh(self) -> Optional[Dict]:
+        snapshot = await self._load()
+        return snapshot if self._is_fresh(snapshot) else None
+
+    async def _fetch_snapshot(self) -> Dict:
+        keywords = await self.harvest()
+        if not keywords or keywords == self.defaults:
+            raise ValueError("no trending keywords extracted")
+        now = time.time()
+        snapshot = {'keywords': list(keywords), 'updated_at': now, 'last_success': now}
+        if self.redis_client:
+            try:
+                await self.redis_client.set(self.key, json.dumps(snapshot))
+            except Exception as e:
+                logger.error(f"Trending snapshot save error: {str(e)}")
+        return snapshot
+
+    async def refresh(self) -> bool:
+        """Bring the snapshot up to date; False when the keywords could not be refreshed"""
+        saved = await self._load()
+        if saved:
+            self._adopt(saved)
+        if self._is_fresh(self.snapshot):
+            self.stats['adopted'] += 1
+            return True
+        try:
+            if self.single_flight:
+                snapshot = await self.single_flight.do(self.key, self._fetch_snapshot, load_result=self._load_fresh)
+            else:
+                snapshot = await self._fetch_snapshot()
+        except Exception as e:
+            self.stats['failures'] += 1
+            self.last_error = str(e)
+            logger.warning(f"Trending keywords refresh failed: {str(e)}")
+            return False
+        self._adopt(snapshot)
+        self.last_error = None
+        self.stats['refreshes'] += 1
+        logger.info(f"Trending keywords refreshed: {len(snapshot['keywords'])} keywords")
+        return True
+
+    async def refresh_periodically(self):
+        """Refresh the snapshot until cancelled"""
+        while True:
+            if await self.refresh():
+                # Wake up when the snapshot (possibly adopted, so already aged) goes stale
+                delay = self.interval - (time.time() - self.snapshot['updated_at'])
+            else:
+                delay = self.retry_delay
+            await asyncio.sleep(max(delay, 1))
+
+    def status(self) -> Dict:
+        snapshot = self.current()
+        return {
+            'interval': self.interval,
+            'keywords': len(snapshot['trending']),
+            'age_seconds': snapshot['age_seconds'],
+            'last_success': snapshot['last_success'],
+            'source': snapshot['source'],
+            'last_error': self.last_error,
+            **self.stats
+        }